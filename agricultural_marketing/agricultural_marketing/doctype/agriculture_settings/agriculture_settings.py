@@ -1,9 +1,32 @@
 # Copyright (c) 2024, Muhammad Salama and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
+SETTINGS_CACHE_KEY = "agriculture_settings"
+
 
 class AgricultureSettings(Document):
-	pass
+	def validate(self):
+		from agricultural_marketing.utils.pdf_backend import WEASYPRINT, import_weasyprint
+
+		if self.pdf_backend == WEASYPRINT:
+			import_weasyprint()
+
+	def on_update(self):
+		clear_agriculture_settings_cache()
+
+
+def get_agriculture_settings():
+	"""
+	Returns Agriculture Settings as a dict, cached in redis (shared by all workers)
+	and memoized for the current request by `frappe.cache`.
+	"""
+	return frappe.cache.get_value(
+		SETTINGS_CACHE_KEY, generator=lambda: frappe.get_single("Agriculture Settings").as_dict()
+	)
+
+
+def clear_agriculture_settings_cache():
+	frappe.cache.delete_value(SETTINGS_CACHE_KEY)
@@ -1,9 +1,19 @@
 # Copyright (c) 2024, Muhammad Salama and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+	get_agriculture_settings,
+)
+
 
 class TestAgricultureSettings(FrappeTestCase):
-	pass
+	def test_cached_settings_are_invalidated_on_update(self):
+		settings = frappe.get_single("Agriculture Settings")
+		settings.customer_commission_percentage = settings.customer_commission_percentage or 1
+		settings.font_size = (get_agriculture_settings().get("font_size") or 14) + 1
+		settings.save()
+
+		self.assertEqual(get_agriculture_settings().get("font_size"), settings.font_size)
@@ -5,6 +5,15 @@ frappe.ui.form.on("Invoice Form", {
  	refresh(frm) {
      	filter_basic_info_fields(frm);
      	filter_child_tables_fields(frm);
+     	if (frm.doc.docstatus == 1 && frm.doc.commission_invoice_status == "Failed") {
+     	    frm.add_custom_button(__("Retry Commission Invoice"), () => {
+     	        frappe.call({
+     	            method: "agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form.retry_commission_invoice",
+     	            args: {invoice_form: frm.doc.name},
+     	            callback: () => frm.reload_doc()
+     	        });
+     	    });
+     	}
      	frm.add_custom_button("Print", () => {
      	    let dialog = new frappe.ui.Dialog({
      	        title: "Print options",
@@ -84,6 +93,9 @@ frappe.ui.form.on("Invoice Form", {
      	    });
      	    dialog.show();
         })
+        frm.add_custom_button(__("Print All Parties"), () => {
+            window.open(`/api/method/agricultural_marketing.pdf.get_all_parties_pdf?reference_name=${encodeURIComponent(frm.doc.name)}`);
+        })
  	},
  	customer: function (frm, cdt, cdn) {
  	    frm.doc.items.forEach((row)=> {
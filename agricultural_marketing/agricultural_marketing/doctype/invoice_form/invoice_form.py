@@ -1,20 +1,32 @@
 # Copyright (c) 2024, Muhammad Salama and contributors
 # For license information, please see license.txt
+import json
+
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from erpnext.accounts.general_ledger import validate_accounting_period, make_entry
 from erpnext.accounts.party import get_party_account
-from frappe.utils import now, flt
-import copy
+from frappe.utils import cint, flt
+
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+from agricultural_marketing.utils.commission import (get_commission_pos_profile, get_party_commission_percentage,
+                                                     get_parties_commission_percentage)
+from agricultural_marketing.utils.general_ledger import (delete_gl_entries_in_bulk, make_gl_entries_in_bulk,
+                                                         reverse_gl_entries_in_bulk, PartyGLMap)
+from agricultural_marketing.utils.taxes import get_tax_rate, get_tax_template
 
 if "settings_manager" in frappe.get_installed_apps():
     from settings_manager.utils.data import money_in_words
 
 
+COMMISSION_INVOICE_MAX_ATTEMPTS = 3
+
+
 class InvoiceForm(Document):
-    if "agricultural_marketing" in frappe.get_installed_apps():
-        settings = frappe.get_single("Agriculture Settings")
+    @property
+    def settings(self):
+        return get_agriculture_settings()
 
     def validate(self):
         self.update_grand_total()
@@ -23,7 +35,10 @@ class InvoiceForm(Document):
     def on_submit(self):
         self.make_gl_entries()
         if self.settings.get("generate_commission_invoices_automatically"):
-            self.generate_commission_invoice()
+            if self.settings.get("enqueue_commission_invoices"):
+                self.enqueue_commission_invoice()
+            else:
+                self.generate_commission_invoice()
 
     def on_cancel(self):
         self.cancel_commission_invoice()
@@ -32,10 +47,7 @@ class InvoiceForm(Document):
     def on_trash(self):
         # delete gl entries on deletion of transaction
         if frappe.db.get_single_value("Accounts Settings", "delete_linked_ledger_entries"):
-            gles = frappe.get_all("GL Entry",
-                                  {"voucher_type": self.doctype, "voucher_no": self.name}, pluck="name")
-            for gle in gles:
-                frappe.delete_doc("GL Entry", gle, for_reload=True)
+            delete_gl_entries_in_bulk(self.doctype, self.name)
         # delete commission invoice on deletion of transaction
         self.delete_commission_invoice()
 
@@ -51,9 +63,7 @@ class InvoiceForm(Document):
             self.set("commissions", [])
             commission_percentage = get_party_commission_percentage("Customer", self.supplier)
 
-            default_tax_template = get_tax_template(self)
-            tax_rate = frappe.db.get_value("Sales Taxes and Charges",
-                                           {"parent": default_tax_template}, "rate") or 0
+            tax_rate = get_tax_rate()
 
             price_after_commission = (self.grand_total * commission_percentage) / 100
             commission_total_with_taxes = (
@@ -71,106 +81,41 @@ class InvoiceForm(Document):
                 item.commission = (item.total * commission_percentage) / 100
 
     def make_gl_entries(self):
-        gl_entries = []
+        make_gl_entries_in_bulk(self.get_gl_map())
+
+    def get_gl_map(self):
         if not self.company:
             frappe.throw(_("Please Select a Company"))
 
         company_defaults = frappe.get_cached_doc("Company", self.company)
-        # For credit entry
-        self.make_supplier_gl_entry(gl_entries, company_defaults)
-
-        # For debits entries
-        self.make_customers_gl_entries(gl_entries, company_defaults)
-
-        for entry in gl_entries:
-            gle = frappe.new_doc("GL Entry")
-            gle.update(entry)
-            gle.flags.ignore_permissions = True
-            gle.submit()
-
-    def make_supplier_gl_entry(self, gl_entries, company_defaults):
-        gl_entries.append({
+        gl_map = PartyGLMap({
             "posting_date": self.posting_date,
             "due_date": self.posting_date,
-            "account": get_party_account("Supplier", self.supplier, self.company),
-            "party_type": "Supplier",
-            "party": self.supplier,
-            "credit": self.grand_total,
             "account_currency": company_defaults.default_currency,
-            "credit_in_account_currency": self.grand_total,
             "voucher_type": self.doctype,
             "voucher_no": self.name,
             "company": self.company,
-            "cost_center": company_defaults.cost_center,
-            "credit_in_transaction_currency": self.grand_total,
-            "transaction_exchange_rate": 1
+            "cost_center": company_defaults.cost_center
         })
-        self.make_gl_dict_for_commission(gl_entries, company_defaults)
-
-    def make_customers_gl_entries(self, gl_entries, company_defaults):
-        customers = []
-        for it in self.items:
-            if it.customer in customers:
-                customer_record = [d for d in gl_entries if d.get("party") == it.customer][0]
-                customer_record.update({
-                    "debit": customer_record["debit"] + it.total,
-                    "debit_in_account_currency": customer_record["debit_in_account_currency"] + it.total,
-                    "debit_in_transaction_currency": customer_record["debit_in_transaction_currency"] + it.total,
-
-                })
-            else:
-                gl_entries.append({
-                    "posting_date": self.posting_date,
-                    "due_date": self.posting_date,
-                    "account": company_defaults.default_receivable_account,
-                    "party_type": "Customer",
-                    "party": it.customer,
-                    "debit": it.total,
-                    "account_currency": company_defaults.default_currency,
-                    "debit_in_account_currency": it.total,
-                    "voucher_type": self.doctype,
-                    "voucher_no": self.name,
-                    "company": self.company,
-                    "cost_center": company_defaults.cost_center,
-                    "debit_in_transaction_currency": it.total,
-                    "transaction_exchange_rate": 1
-                })
-                customers.append(it.customer)
+        # For credit entry
+        self.make_supplier_gl_entry(gl_map, company_defaults)
+
+        # For debits entries
+        self.make_customers_gl_entries(gl_map, company_defaults)
+
+        return gl_map.get_gl_map()
+
+    def make_supplier_gl_entry(self, gl_map, company_defaults):
+        gl_map.add(get_party_account("Supplier", self.supplier, self.company), self.grand_total,
+                   "Supplier", self.supplier, side="credit")
+        self.make_gl_dict_for_commission(gl_map, company_defaults)
+
+    def make_customers_gl_entries(self, gl_map, company_defaults):
+        gl_map.add_lines(self.items, company_defaults.default_receivable_account, "Customer", "customer")
 
     def make_gl_entries_on_cancel(self):
-        gl_entry = frappe.qb.DocType("GL Entry")
-        gl_entries = (
-            frappe.qb.from_(gl_entry)
-            .select("*")
-            .where(gl_entry.voucher_type == self.doctype)
-            .where(gl_entry.voucher_no == self.name)
-            .where(gl_entry.is_cancelled == 0)
-            .for_update()
-        ).run(as_dict=1)
-        if gl_entries:
-            self.flags.ignore_links = True
-            validate_accounting_period(gl_entries)
-            set_as_cancel(self.doctype, self.name)
-
-            for entry in gl_entries:
-                new_gle = copy.deepcopy(entry)
-                new_gle["name"] = None
-                debit = new_gle.get("debit", 0)
-                credit = new_gle.get("credit", 0)
-
-                debit_in_account_currency = new_gle.get("debit_in_account_currency", 0)
-                credit_in_account_currency = new_gle.get("credit_in_account_currency", 0)
-
-                new_gle["debit"] = credit
-                new_gle["credit"] = debit
-                new_gle["debit_in_account_currency"] = credit_in_account_currency
-                new_gle["credit_in_account_currency"] = debit_in_account_currency
-
-                new_gle["remarks"] = "On cancellation of " + new_gle["voucher_no"]
-                new_gle["is_cancelled"] = 1
-
-                if new_gle["debit"] or new_gle["credit"]:
-                    make_entry(new_gle, False, "Yes")
+        self.flags.ignore_links = True
+        reverse_gl_entries_in_bulk(self.doctype, self.name)
 
     def generate_commission_invoice(self):
         if len(self.commissions) == 0:
@@ -187,17 +132,31 @@ class InvoiceForm(Document):
             total_commission += (it.price * it.commission) / 100
 
         # Generate the commission sales invoice
-        pos_profile = frappe.get_doc("POS Profile", self.settings.get("pos_profile"))
-        commission_invoice = create_commission_invoice(self, supplier_related_customer, pos_profile,
-                                                       total_commission)
-        self.db_set("commission_invoice_reference", commission_invoice.name)
+        commission_invoice = create_commission_invoice(self, supplier_related_customer, total_commission)
+        self.db_set({"commission_invoice_reference": commission_invoice.name,
+                     "commission_invoice_status": "Completed"})
+
+    def enqueue_commission_invoice(self, attempt=1):
+        if len(self.commissions) == 0:
+            return
+
+        self.db_set("commission_invoice_status", "Queued")
+        frappe.enqueue(
+            "agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form."
+            "generate_commission_invoice_job",
+            job_id=f"commission_invoice::{self.name}::{attempt}",
+            deduplicate=True,
+            enqueue_after_commit=True,
+            invoice_form=self.name,
+            attempt=attempt
+        )
 
     def cancel_commission_invoice(self):
         if self.commission_invoice_reference:
             commission_invoice = frappe.get_doc("Sales Invoice", self.commission_invoice_reference)
             if commission_invoice.docstatus == 0:
                 delete_reference_invoice(commission_invoice)
-                self.db_set("commission_invoice_reference", "")
+                self.db_set({"commission_invoice_reference": "", "commission_invoice_status": ""})
             if commission_invoice.docstatus == 1:
                 commission_invoice.cancel()
 
@@ -212,93 +171,116 @@ class InvoiceForm(Document):
                 if commission_invoice.docstatus == 1:
                     commission_invoice.cancel()
 
-    def make_gl_dict_for_commission(self, gl_entries, company_defaults):
+    def make_gl_dict_for_commission(self, gl_map, company_defaults):
         if len(self.commissions) != 0:
-            mops = frappe.get_doc("POS Profile", self.settings.get("pos_profile")).get("payments")
-            for mop in mops:
-                if mop.default:
-                    default_commission_account = frappe.db.get_value(
-                        "Mode of Payment Account",
-                        {"parent": mop.mode_of_payment, "company": self.company},
-                        "default_account",
-                    )
-                    break
-
-            gl_entries.append({
-                "posting_date": self.posting_date,
-                "due_date": self.posting_date,
-                "account": get_party_account("Supplier", self.supplier, self.company),
-                "party_type": "Supplier",
-                "party": self.supplier,
-                "debit": self.total_commissions_and_taxes,
-                "account_currency": company_defaults.default_currency,
-                "debit_in_account_currency": self.total_commissions_and_taxes,
-                "voucher_type": self.doctype,
-                "voucher_no": self.name,
-                "company": self.company,
-                "cost_center": company_defaults.cost_center,
-                "debit_in_transaction_currency": self.total_commissions_and_taxes,
-                "transaction_exchange_rate": 1
-            })
+            default_commission_account = get_commission_pos_profile(self.company).default_account
 
-            gl_entries.append({
-                "posting_date": self.posting_date,
-                "due_date": self.posting_date,
-                "account": default_commission_account,
-                "credit": self.total_commissions_and_taxes,
-                "account_currency": company_defaults.default_currency,
-                "credit_in_account_currency": self.total_commissions_and_taxes,
-                "voucher_type": self.doctype,
-                "voucher_no": self.name,
-                "company": self.company,
-                "cost_center": company_defaults.cost_center,
-                "credit_in_transaction_currency": self.total_commissions_and_taxes,
-                "transaction_exchange_rate": 1
-            })
+            gl_map.add(get_party_account("Supplier", self.supplier, self.company), self.total_commissions_and_taxes,
+                       "Supplier", self.supplier, side="debit")
+            gl_map.add(default_commission_account, self.total_commissions_and_taxes, side="credit")
 
 
-def set_as_cancel(voucher_type, voucher_no):
+def generate_commission_invoice_job(invoice_form, attempt=1):
     """
-    Set is_cancelled=1 in all original gl entries for the voucher
+    Background job creating the commission invoice of a submitted `invoice_form`.
+    Idempotent: the invoice form row is locked and nothing is done when it already has a commission invoice.
+    Failed attempts are retried up to `COMMISSION_INVOICE_MAX_ATTEMPTS` times.
     """
-    frappe.db.sql(
-        """UPDATE `tabGL Entry` SET is_cancelled = 1,
-        modified=%s, modified_by=%s
-        where voucher_type=%s and voucher_no=%s and is_cancelled = 0""",
-        (now(), frappe.session.user, voucher_type, voucher_no),
-    )
+    doc = frappe.get_doc("Invoice Form", invoice_form, for_update=True)
+    if doc.docstatus != 1 or doc.commission_invoice_reference:
+        return
+
+    try:
+        doc.generate_commission_invoice()
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title=_("Commission invoice generation failed for {0}").format(invoice_form),
+                         reference_doctype="Invoice Form", reference_name=invoice_form)
+        doc = frappe.get_doc("Invoice Form", invoice_form)
+        if attempt < COMMISSION_INVOICE_MAX_ATTEMPTS:
+            doc.enqueue_commission_invoice(attempt=attempt + 1)
+        else:
+            doc.db_set("commission_invoice_status", "Failed")
+        frappe.db.commit()
 
 
-def get_party_commission_percentage(party_type, party):
-    """
-    Returns the commission percentage for the given `party`.
-    Will first search in party (Customer / Supplier) record, if not found,
-    will search in group (Customer Group / Supplier Group),
-    finally will return default."""
+@frappe.whitelist()
+def retry_commission_invoice(invoice_form):
+    doc = frappe.get_doc("Invoice Form", invoice_form)
+    doc.check_permission("submit")
+    if doc.docstatus != 1 or doc.commission_invoice_reference:
+        frappe.throw(_("Commission invoice can only be generated for submitted invoice forms without one"))
 
-    # Get the percentage from the party doc
-    commission_percentage = frappe.db.get_value(party_type, party, "commission_percentage")
-    if commission_percentage:
-        return commission_percentage
+    doc.enqueue_commission_invoice()
 
-    # Get the percentage from the party group doc
-    party_group_doctype = "Customer Group" if party_type == "Customer" else "Supplier Group"
-    group_field_name = "customer_group" if party_type == "Customer" else "supplier_group"
-    party_group = frappe.db.get_value(party_type, party, group_field_name)
-    commission_percentage = frappe.db.get_value(party_group_doctype, party_group, "commission_percentage")
-    if commission_percentage:
-        return commission_percentage
 
-    # Get the percentage from the Agriculture Settings single doc
-    return frappe.get_single("Agriculture Settings").get("customer_commission_percentage", 0)
+@frappe.whitelist()
+def bulk_submit(names):
+    """Submit the selected draft invoice forms in a background job."""
+    if isinstance(names, str):
+        names = json.loads(names)
+
+    frappe.has_permission("Invoice Form", "submit", throw=True)
+    frappe.enqueue(
+        "agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form.bulk_submit_invoice_forms",
+        queue="long",
+        timeout=3600,
+        names=names
+    )
 
 
-def create_commission_invoice(invoice, supplier_related_customer, pos_profile, total_commission):
+def bulk_submit_invoice_forms(names):
+    """
+    Submit the draft invoice forms `names`, committing every `Bulk Submit Chunk Size` forms.
+    Settings, tax rate, commission percentages and company defaults are resolved once for the batch.
+    Progress and per-document failures are published to the user over realtime.
+    """
+    chunk_size = cint(get_agriculture_settings().get("bulk_submit_chunk_size")) or 50
+    drafts = frappe.get_all("Invoice Form", filters={"name": ["in", names], "docstatus": 0},
+                            fields=["name", "supplier", "company"], order_by="posting_date, name")
+    failures = [{"name": name, "error": _("Not a draft invoice form")}
+                for name in set(names) - {draft.name for draft in drafts}]
+
+    # Warm the shared lookups once for the whole batch
+    get_tax_rate()
+    get_parties_commission_percentage("Customer", [draft.supplier for draft in drafts if draft.supplier])
+    for company in {draft.company for draft in drafts if draft.company}:
+        frappe.get_cached_doc("Company", company)
+
+    submitted = 0
+    for idx, draft in enumerate(drafts, start=1):
+        frappe.db.savepoint("bulk_submit_invoice_form")
+        try:
+            frappe.get_doc("Invoice Form", draft.name).submit()
+            submitted += 1
+        except Exception as e:
+            frappe.db.rollback(save_point="bulk_submit_invoice_form")
+            failures.append({"name": draft.name, "error": str(e)})
+
+        if idx % chunk_size == 0 or idx == len(drafts):
+            frappe.db.commit()
+            frappe.publish_progress(idx * 100 / len(drafts), title=_("Submitting Invoice Forms"),
+                                    description=_("{0} of {1}").format(idx, len(drafts)))
+
+    frappe.publish_realtime("invoice_form_bulk_submit", {
+        "submitted": submitted,
+        "failures": failures
+    }, user=frappe.session.user)
+
+
+def create_commission_invoice(invoice, supplier_related_customer, total_commission):
+    """
+    Build the commission sales invoice with its taxes and payment computed in memory,
+    so it is persisted with a single insert.
+    """
+    pos_profile = get_commission_pos_profile(invoice.company)
     commission_invoice = frappe.new_doc("Sales Invoice")
     commission_invoice.update({
         "customer": supplier_related_customer,
         "is_pos": 1,
-        "pos_profile": pos_profile.get("name")
+        "pos_profile": pos_profile.name,
+        "taxes_and_charges": get_tax_template()
     })
     commission_invoice.append("items", {
         "item_code": invoice.settings.get("commission_item"),
@@ -306,82 +288,94 @@ def create_commission_invoice(invoice, supplier_related_customer, pos_profile, t
         "qty": 1,
         "rate": total_commission
     })
-    default_tax_template = get_tax_template(invoice)
-    commission_invoice.update({
-        "taxes_and_charges": default_tax_template
-    })
-    commission_invoice.save()
-    for mop in pos_profile.get("payments", []):
-        if mop.default:
-            default_mop = mop.mode_of_payment
+    commission_invoice.set_missing_values(for_validate=True)
+    commission_invoice.set_taxes()
+    commission_invoice.calculate_taxes_and_totals()
 
     commission_invoice.append("payments", {
-        "mode_of_payment": default_mop,
+        "mode_of_payment": pos_profile.default_mode_of_payment,
         "amount": commission_invoice.grand_total
     })
-    commission_invoice.save()
+    commission_invoice.insert()
     return commission_invoice
 
 
-def get_tax_template(invoice):
-    default_tax_template = invoice.settings.get("default_tax")
-
-    if not default_tax_template:
-        default_tax_template = frappe.db.get_value("Sales Taxes and Charges",
-                                                   {"is_default": 1}, "name")
-
-    return default_tax_template
-
-
 def delete_reference_invoice(ref_invoice):
     ref_invoice.run_method("on_trash")
     frappe.delete_doc("Sales Invoice", ref_invoice.name, for_reload=True)
 
 
 def build_pdf_template_context(filters):
-    invform = frappe.qb.DocType("Invoice Form")
-    invformitem = frappe.qb.DocType("Invoice Form Item")
-
     if filters.get("party_type") == "Supplier":
-        res = [frappe.get_doc(filters.get("reference_doctype"), filters.get("reference_name")).as_dict()]
-        total_commission_percentage = sum([row["commission"] for row in res[0].get("commissions", [])]) or 0
-        total_taxes_rate = sum([row["taxes"] for row in res[0].get("commissions", [])]) or 0
-        total_commission = (res[0].grand_total * total_commission_percentage) / 100 or 0
-        total_taxes = (total_commission * total_taxes_rate) / 100 or 0
-        res[0].update({
-            "total_commission": flt(total_commission, 2),
-            "total_taxes": flt(total_taxes, 2),
-            "net_total": flt(res[0].grand_total - res[0].total_commissions_and_taxes, 2),
-            "net_total_in_words": money_in_words((res[0].grand_total - res[0].total_commissions_and_taxes))
+        return get_supplier_slip(frappe.get_doc(filters.get("reference_doctype"), filters.get("reference_name")).as_dict())
 
-        })
+    party_field = "customer" if filters.get("customer_type") == "Customer" else "pamper"
+    return get_party_slip(get_slip_items(filters.get("reference_name"), party_field, filters.get("party")))
 
-    else:
-        inv_query = frappe.qb.from_(invform).join(invformitem)
-
-        if filters.get("customer_type") == "Customer":
-            res = inv_query.on(
-                (invformitem.parent == invform.name) & (invformitem.customer == filters.get("party"))).where(
-                invform.name == filters.get("reference_name")).select(
-                invform.supplier, invform.customer.as_('inv_customer'),
-                invform.name, invform.company, invform.posting_date, invformitem.customer,
-                invformitem.item_name, invformitem.qty, invformitem.price, invformitem.total).run(
-                as_dict=True)
-            res[0].update({
-                "net_total": flt(sum([row["total"] for row in res]), 2) or 0,
-                "net_total_in_words": money_in_words(sum([row["total"] for row in res]) or 0)
-            })
-        else:
-            res = inv_query.on(
-                (invformitem.parent == invform.name) & (invformitem.pamper == filters.get("party"))).where(
-                invform.name == filters.get("reference_name")).select(
-                invform.supplier, invform.customer.as_('inv_customer'),
-                invform.name, invform.company, invform.posting_date, invformitem.pamper,
-                invformitem.item_name, invformitem.qty, invformitem.price, invformitem.total).run(
-                as_dict=True)
-            res[0].update({
-                "net_total": flt(sum([row["total"] for row in res]), 2) or 0,
-                "net_total_in_words": money_in_words(sum([row["total"] for row in res]) or 0)
-            })
 
+def build_all_party_slips(invoice_form):
+    """
+    Returns [(filters, data)] for the supplier slip and the slip of every customer and pamper of `invoice_form`,
+    the items of all the slips are fetched in a single query.
+    """
+    doc = frappe.get_doc("Invoice Form", invoice_form).as_dict()
+    slips = [(frappe._dict(party_type="Supplier", party=doc.supplier, customer_type=""), get_supplier_slip(doc))]
+
+    customers, pampers = {}, {}
+    for row in get_slip_items(invoice_form):
+        if row.customer:
+            customers.setdefault(row.customer, []).append(row)
+        if row.pamper:
+            # A copy, the slip totals are set on the first row of each slip
+            pampers.setdefault(row.pamper, []).append(frappe._dict(row))
+
+    for customer_type, parties in (("Customer", customers), ("Pamper", pampers)):
+        for party, rows in parties.items():
+            slips.append((frappe._dict(party_type="Customer", party=party, customer_type=customer_type),
+                          get_party_slip(rows)))
+
+    for filters, _data in slips:
+        filters.update({"reference_doctype": "Invoice Form", "reference_name": invoice_form})
+
+    return slips
+
+
+def get_supplier_slip(doc):
+    res = [doc]
+    total_commission_percentage = sum([row["commission"] for row in res[0].get("commissions", [])]) or 0
+    total_taxes_rate = sum([row["taxes"] for row in res[0].get("commissions", [])]) or 0
+    total_commission = (res[0].grand_total * total_commission_percentage) / 100 or 0
+    total_taxes = (total_commission * total_taxes_rate) / 100 or 0
+    res[0].update({
+        "total_commission": flt(total_commission, 2),
+        "total_taxes": flt(total_taxes, 2),
+        "net_total": flt(res[0].grand_total - res[0].total_commissions_and_taxes, 2),
+        "net_total_in_words": money_in_words((res[0].grand_total - res[0].total_commissions_and_taxes))
+
+    })
     return res
+
+
+def get_party_slip(res):
+    res[0].update({
+        "net_total": flt(sum([row["total"] for row in res]), 2) or 0,
+        "net_total_in_words": money_in_words(sum([row["total"] for row in res]) or 0)
+    })
+    return res
+
+
+def get_slip_items(invoice_form, party_field=None, party=None):
+    """Returns the item rows of `invoice_form`, only the rows of `party` when `party_field` is given."""
+    invform = frappe.qb.DocType("Invoice Form")
+    invformitem = frappe.qb.DocType("Invoice Form Item")
+
+    condition = invformitem.parent == invform.name
+    if party_field:
+        condition &= invformitem[party_field] == party
+
+    return frappe.qb.from_(invform).join(invformitem).on(condition).where(
+        invform.name == invoice_form).select(
+        invform.supplier, invform.customer.as_('inv_customer'),
+        invform.name, invform.company, invform.posting_date, invformitem.customer, invformitem.pamper,
+        invformitem.item_name, invformitem.qty, invformitem.price, invformitem.total).orderby(
+        invformitem.idx).run(as_dict=True)
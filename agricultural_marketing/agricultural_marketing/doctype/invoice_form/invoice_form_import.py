@@ -0,0 +1,188 @@
+# Copyright (c) 2026, Muhammad Salama and contributors
+# For license information, please see license.txt
+import csv
+import os
+import time
+from itertools import groupby, islice
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, getdate, nowdate
+
+IMPORT_COLUMNS = ("supplier", "posting_date", "item_code", "qty", "price", "customer", "pamper", "company")
+FORMS_PER_CHUNK = 100
+
+
+@frappe.whitelist()
+def import_invoice_forms(file_url, dry_run=0):
+    """Import a weigh-bridge / auction sheet (CSV or XLSX) as invoice forms in a background job."""
+    frappe.has_permission("Invoice Form", "create", throw=True)
+    frappe.enqueue(
+        "agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form_import.run_import",
+        queue="long",
+        timeout=7200,
+        file_url=file_url,
+        dry_run=cint(dry_run)
+    )
+
+
+def run_import(file_url, dry_run=0):
+    report = import_sheet(frappe.get_doc("File", {"file_url": file_url}).get_full_path(), dry_run=dry_run)
+    frappe.publish_realtime("invoice_form_import", report, user=frappe.session.user)
+    return report
+
+
+def import_sheet(path, dry_run=0):
+    """
+    Stream the sheet at `path` and create one invoice form per consecutive run of lines
+    sharing the same (supplier, posting date, company).
+    Links are resolved in bulk for every chunk of `FORMS_PER_CHUNK` forms, which is committed
+    (or rolled back in dry-run mode) as a whole.
+    """
+    start = time.monotonic()
+    report = frappe._dict(dry_run=cint(dry_run), rows=0, forms=0, errors=[])
+    default_company = frappe.defaults.get_user_default("Company")
+
+    forms = groupby(read_rows(path), key=lambda row: (row.supplier, row.posting_date,
+                                                       row.company or default_company))
+    for chunk in iter_chunks(forms, FORMS_PER_CHUNK):
+        links = resolve_links(chunk)
+        for (supplier, posting_date, company), lines in chunk:
+            report.rows += len(lines)
+            errors = validate_lines(lines, links, company)
+            if errors:
+                report.errors.extend(errors)
+                continue
+
+            frappe.db.savepoint("invoice_form_import")
+            try:
+                doc = make_invoice_form(supplier, posting_date, company, lines, links)
+                # Inserted in dry-run mode as well, so naming, mandatory and child row checks run too
+                doc.insert()
+                report.forms += 1
+            except Exception as e:
+                frappe.db.rollback(save_point="invoice_form_import")
+                report.errors.append({"row": lines[0].idx, "error": str(e)})
+
+        if dry_run:
+            frappe.db.rollback()
+        else:
+            frappe.db.commit()
+
+    report.seconds = flt(time.monotonic() - start, 2)
+    report.rows_per_second = flt(report.rows / report.seconds, 2) if report.seconds else report.rows
+    return report
+
+
+def read_rows(path):
+    """Yield the sheet lines one by one as dicts with the `IMPORT_COLUMNS` keys."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            yield from make_rows(reader)
+    elif extension == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from make_rows(workbook.active.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+    else:
+        frappe.throw(_("Only CSV and XLSX files can be imported"))
+
+
+def make_rows(lines):
+    header = [frappe.scrub(str(column or "")) for column in next(lines, [])]
+    missing = [column for column in IMPORT_COLUMNS[:5] if column not in header]
+    if missing:
+        frappe.throw(_("Missing columns: {0}").format(", ".join(missing)))
+
+    for idx, line in enumerate(lines, start=2):
+        if not any(line):
+            continue
+
+        row = frappe._dict(zip(header, line))
+        row.idx = idx
+        for column in IMPORT_COLUMNS:
+            value = row.get(column)
+            row[column] = value.strip() if isinstance(value, str) else value
+        yield row
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := [(key, list(lines)) for key, lines in islice(iterator, size)]:
+        yield chunk
+
+
+def resolve_links(chunk):
+    """Resolve every Company, Supplier, Customer and Item of the chunk with one query per doctype."""
+    companies, suppliers, customers, items = set(), set(), set(), set()
+    for (supplier, posting_date, company), lines in chunk:
+        suppliers.add(supplier)
+        if company:
+            companies.add(company)
+        for line in lines:
+            items.add(line.item_code)
+            customers.update(filter(None, (line.customer, line.pamper)))
+
+    return frappe._dict(
+        companies=set(frappe.get_all("Company", filters={"name": ["in", list(companies)]},
+                                     pluck="name")) if companies else set(),
+        suppliers=dict(frappe.get_all("Supplier", filters={"name": ["in", list(suppliers)]},
+                                      fields=["name", "supplier_name"], as_list=True)) if suppliers else {},
+        customers=dict(frappe.get_all("Customer", filters={"name": ["in", list(customers)]},
+                                      fields=["name", "customer_name"], as_list=True)) if customers else {},
+        items=dict(frappe.get_all("Item", filters={"name": ["in", list(items)]},
+                                  fields=["name", "item_name"], as_list=True)) if items else {}
+    )
+
+
+def validate_lines(lines, links, company):
+    """Returns the errors of the `lines` of one form, every link of the form must be resolved in `links`."""
+    errors = []
+    if not company or company not in links.companies:
+        errors.append({"row": lines[0].idx, "error": _("Company {0} not found").format(company)})
+
+    for line in lines:
+        if line.posting_date:
+            try:
+                getdate(line.posting_date)
+            except Exception:
+                errors.append({"row": line.idx, "error": _("Invalid posting date {0}").format(line.posting_date)})
+        if not line.supplier or line.supplier not in links.suppliers:
+            errors.append({"row": line.idx, "error": _("Supplier {0} not found").format(line.supplier)})
+        if not line.item_code or line.item_code not in links.items:
+            errors.append({"row": line.idx, "error": _("Item {0} not found").format(line.item_code)})
+        for field in ("customer", "pamper"):
+            if line.get(field) and line.get(field) not in links.customers:
+                errors.append({"row": line.idx, "error": _("Customer {0} not found").format(line.get(field))})
+        if flt(line.qty) <= 0:
+            errors.append({"row": line.idx, "error": _("Qty must be greater than zero")})
+
+    return errors
+
+
+def make_invoice_form(supplier, posting_date, company, lines, links):
+    doc = frappe.get_doc({
+        "doctype": "Invoice Form",
+        "company": company,
+        "posting_date": getdate(posting_date) if posting_date else nowdate(),
+        "supplier": supplier,
+        "supplier_name": links.suppliers.get(supplier),
+        "items": [{
+            "item_code": line.item_code,
+            "item_name": links.items.get(line.item_code),
+            "qty": flt(line.qty),
+            "price": flt(line.price),
+            "total": flt(line.qty) * flt(line.price),
+            "customer": line.customer,
+            "pamper": line.pamper
+        } for line in lines]
+    })
+    # Company, supplier, item, customer and pamper, every link set above, are already resolved in bulk for the
+    # whole chunk by `resolve_links` and checked by `validate_lines`
+    doc.flags.ignore_links = True
+    return doc
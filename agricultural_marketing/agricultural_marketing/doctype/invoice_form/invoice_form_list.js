@@ -0,0 +1,72 @@
+// Copyright (c) 2026, Muhammad Salama and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Invoice Form"] = {
+    onload(listview) {
+        listview.page.add_actions_menu_item(__("Submit in Background"), () => {
+            let names = listview.get_checked_items(true);
+            if (!names.length) {
+                frappe.msgprint(__("Please select the invoice forms to submit"));
+                return;
+            }
+            frappe.call({
+                method: "agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form.bulk_submit",
+                args: {names: names},
+                callback: () => {
+                    frappe.show_alert({message: __("Submitting {0} invoice forms in the background", [names.length]), indicator: "blue"});
+                }
+            });
+        }, false);
+
+        listview.page.add_inner_button(__("Import Sheet"), () => {
+            let dialog = new frappe.ui.Dialog({
+                title: __("Import Invoice Forms"),
+                fields: [
+                    {label: __("Sheet"), fieldname: "file_url", fieldtype: "Attach", reqd: 1,
+                     description: __("CSV or XLSX with columns: supplier, posting_date, item_code, qty, price, customer, pamper, company")},
+                    {label: __("Dry Run"), fieldname: "dry_run", fieldtype: "Check", default: 1},
+                ],
+                primary_action_label: __("Import"),
+                primary_action(values) {
+                    dialog.hide();
+                    frappe.call({
+                        method: "agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form_import.import_invoice_forms",
+                        args: values,
+                        callback: () => {
+                            frappe.show_alert({message: __("Importing in the background"), indicator: "blue"});
+                        }
+                    });
+                }
+            });
+            dialog.show();
+        });
+
+        frappe.realtime.off("invoice_form_import");
+        frappe.realtime.on("invoice_form_import", (report) => {
+            listview.refresh();
+            let errors = report.errors.map((e) => `<li>${__("Row {0}", [e.row])}: ${e.error}</li>`).join("");
+            frappe.msgprint({
+                title: report.dry_run ? __("Import Dry Run") : __("Import Finished"),
+                message: __("{0} rows, {1} invoice forms in {2} seconds ({3} rows/second)",
+                    [report.rows, report.forms, report.seconds, report.rows_per_second]) + (errors ? `<ul>${errors}</ul>` : ""),
+                indicator: report.errors.length ? "orange" : "green"
+            });
+        });
+
+        frappe.realtime.off("invoice_form_bulk_submit");
+        frappe.realtime.on("invoice_form_bulk_submit", (data) => {
+            frappe.hide_progress();
+            listview.refresh();
+            if (data.failures.length) {
+                let rows = data.failures.map((f) => `<li><b>${f.name}</b>: ${f.error}</li>`).join("");
+                frappe.msgprint({
+                    title: __("{0} invoice forms submitted, {1} failed", [data.submitted, data.failures.length]),
+                    message: `<ul>${rows}</ul>`,
+                    indicator: "orange"
+                });
+            } else {
+                frappe.show_alert({message: __("{0} invoice forms submitted", [data.submitted]), indicator: "green"});
+            }
+        });
+    }
+};
@@ -1,9 +1,182 @@
 # Copyright (c) 2024, Muhammad Salama and Contributors
 # See license.txt
 
-# import frappe
+from itertools import groupby
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.utils import get_fiscal_year
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt, nowdate
+
+from agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form_import import (iter_chunks,
+                                                                                                    make_rows,
+                                                                                                    validate_lines)
+from agricultural_marketing.utils.general_ledger import PartyGLMap
+
+INVOICE_FORM_MODULE = "agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form"
 
 
 class TestInvoiceForm(FrappeTestCase):
-	pass
+	def test_submit_posts_balanced_gl_entries_in_bulk(self):
+		invoice_form = make_invoice_form([("_Test Customer", 100), ("_Test Customer 1", 40), ("_Test Customer", 60)])
+
+		gl_entries = get_gl_entries(invoice_form.name)
+		self.assertEqual(len(gl_entries), 3)
+		self.assertEqual(sum(d.debit for d in gl_entries), sum(d.credit for d in gl_entries))
+
+		# The columns of the GL Entry lifecycle are set on the bulk inserted rows
+		fiscal_year = get_fiscal_year(invoice_form.posting_date, company=invoice_form.company)[0]
+		to_rename = 0 if frappe.get_meta("GL Entry").autoname == "hash" else 1
+		for entry in gl_entries:
+			self.assertEqual(entry.fiscal_year, fiscal_year)
+			self.assertEqual(entry.to_rename, to_rename)
+			self.assertEqual(entry.docstatus, 1)
+			self.assertEqual(entry.is_cancelled, 0)
+
+		# The lines of a customer are merged into one debit row
+		debits = {d.party: d.debit for d in gl_entries if d.party_type == "Customer"}
+		self.assertEqual(debits, {"_Test Customer": 160, "_Test Customer 1": 40})
+		credits = {d.party: d.credit for d in gl_entries if d.party_type == "Supplier"}
+		self.assertEqual(credits, {"_Test Supplier": 200})
+
+	def test_submit_rejects_frozen_party(self):
+		frappe.db.set_value("Customer", "_Test Customer 1", "is_frozen", 1)
+		self.addCleanup(frappe.db.set_value, "Customer", "_Test Customer 1", "is_frozen", 0)
+		frappe.db.set_single_value("Accounts Settings", "frozen_accounts_modifier", None)
+
+		# The batched validator keeps the checks of GL Entry.submit
+		with self.assertRaises(frappe.ValidationError):
+			make_invoice_form([("_Test Customer", 100), ("_Test Customer 1", 40)])
+
+	def test_cancel_reverses_gl_entries_in_bulk(self):
+		invoice_form = make_invoice_form([("_Test Customer", 100), ("_Test Customer 1", 40), ("_Test Customer 2", 0)])
+		originals = get_gl_entries(invoice_form.name)
+		with patch(f"{INVOICE_FORM_MODULE}.get_agriculture_settings", return_value={}):
+			invoice_form.cancel()
+
+		gl_entries = get_gl_entries(invoice_form.name)
+		self.assertTrue(all(d.is_cancelled for d in gl_entries))
+
+		remarks = f"On cancellation of {invoice_form.name}"
+		mirrors = {(d.account, d.party): d for d in gl_entries if d.remarks == remarks}
+		# The zero row of _Test Customer 2 is not reversed
+		self.assertEqual(len(mirrors), len(originals) - 1)
+		for original in originals:
+			mirror = mirrors.get((original.account, original.party))
+			if not (original.debit or original.credit):
+				self.assertIsNone(mirror)
+				continue
+
+			for suffix in ("", "_in_account_currency", "_in_transaction_currency"):
+				self.assertEqual(mirror[f"debit{suffix}"], original[f"credit{suffix}"])
+				self.assertEqual(mirror[f"credit{suffix}"], original[f"debit{suffix}"])
+
+		balances = {}
+		for d in gl_entries:
+			balances[d.party] = balances.get(d.party, 0) + d.debit - d.credit
+		# Every party nets to zero once the voucher is reversed
+		self.assertTrue(all(flt(balance, 2) == 0 for balance in balances.values()))
+
+	def test_party_gl_map_merges_repeated_parties(self):
+		gl_map = PartyGLMap({"voucher_no": "ACC-INV-TEST"})
+		lines = [
+			frappe._dict(customer="Customer A", pamper="Pamper A", total=100),
+			frappe._dict(customer="Customer B", pamper="Pamper A", total=50),
+			frappe._dict(customer="Customer A", pamper="Pamper B", total=25),
+		]
+		gl_map.add_lines(lines, "Debtors", "Customer", "customer")
+		gl_map.add("Creditors", 175, "Supplier", "Supplier A", side="credit")
+		gl_map.add("Creditors", 10, "Supplier", "Supplier A", side="debit")
+
+		entries = {(d["party"], "debit" if "debit" in d else "credit"): d for d in gl_map.get_gl_map()}
+		self.assertEqual(len(entries), 4)
+		self.assertEqual(entries[("Customer A", "debit")]["debit"], 125)
+		self.assertEqual(entries[("Customer A", "debit")]["debit_in_account_currency"], 125)
+		self.assertEqual(entries[("Customer B", "debit")]["debit"], 50)
+		self.assertEqual(entries[("Supplier A", "credit")]["credit"], 175)
+		self.assertEqual(entries[("Supplier A", "debit")]["debit"], 10)
+
+	def test_party_gl_map_aggregates_by_pamper(self):
+		gl_map = PartyGLMap({})
+		lines = [frappe._dict(pamper="Pamper A", total=10), frappe._dict(pamper="Pamper A", total=15)]
+		gl_map.add_lines(lines, "Debtors", "Customer", "pamper")
+
+		self.assertEqual([d["debit"] for d in gl_map.get_gl_map()], [25])
+
+	def test_import_rows_are_grouped_per_form_and_chunked(self):
+		lines = iter([
+			("Supplier", "Posting Date", "Item Code", "Qty", "Price", "Customer", "Pamper", "Company"),
+			(" Supplier A ", "2024-01-01", "Item A", 10, 5, "Customer A", None, None),
+			("Supplier A", "2024-01-01", "Item B", 2, 3, "Customer B", None, None),
+			(None, None, None, None, None, None, None, None),
+			("Supplier B", "2024-01-01", "Item A", 1, 1, None, "Pamper A", None),
+			("Supplier A", "2024-01-02", "Item A", 4, 4, None, None, None),
+		])
+		rows = list(make_rows(lines))
+		# Blank lines are skipped, values are stripped and rows keep their sheet line number
+		self.assertEqual([row.idx for row in rows], [2, 3, 5, 6])
+		self.assertEqual(rows[0].supplier, "Supplier A")
+
+		forms = groupby(rows, key=lambda row: (row.supplier, row.posting_date, row.company))
+		chunks = list(iter_chunks(forms, 2))
+		self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+		forms = [(key[0], len(form_lines)) for chunk in chunks for key, form_lines in chunk]
+		self.assertEqual(forms, [("Supplier A", 2), ("Supplier B", 1), ("Supplier A", 1)])
+
+	def test_import_throws_on_missing_columns(self):
+		lines = iter([("Supplier", "Posting Date", "Qty"), ("Supplier A", "2024-01-01", 1)])
+		with self.assertRaises(frappe.ValidationError) as e:
+			list(make_rows(lines))
+
+		self.assertIn("item_code", str(e.exception))
+		self.assertIn("price", str(e.exception))
+
+	def test_import_rejects_unknown_company_and_invalid_dates(self):
+		links = frappe._dict(
+			companies={"_Test Company"}, suppliers={"Supplier A": "Supplier A"}, items={"Item A": "Item A"}, customers={}
+		)
+		line = frappe._dict(idx=2, supplier="Supplier A", item_code="Item A", qty=1, posting_date="2024-01-01")
+		self.assertEqual(validate_lines([line], links, "_Test Company"), [])
+
+		for company in ("_Test Unknown Company", None):
+			errors = validate_lines([line], links, company)
+			self.assertEqual([error["row"] for error in errors], [2])
+
+		errors = validate_lines([frappe._dict(line, posting_date="2024-13-45")], links, "_Test Company")
+		self.assertEqual([error["row"] for error in errors], [2])
+
+
+def make_invoice_form(items):
+	"""Submits an Invoice Form of `items` ([(customer, total)]) without commission."""
+	doc = frappe.get_doc(
+		{
+			"doctype": "Invoice Form",
+			"company": "_Test Company",
+			"supplier": "_Test Supplier",
+			"posting_date": nowdate(),
+			"items": [
+				{
+					"item_code": "_Test Item",
+					"item_name": "_Test Item",
+					"qty": 1,
+					"price": total,
+					"total": total,
+					"customer": customer,
+				}
+				for customer, total in items
+			],
+		}
+	)
+	# Without a commission item the form posts only the supplier and customer rows
+	with patch(f"{INVOICE_FORM_MODULE}.get_agriculture_settings", return_value={}):
+		doc.insert()
+		doc.submit()
+
+	return doc
+
+
+def get_gl_entries(voucher_no):
+	return frappe.get_all(
+		"GL Entry", filters={"voucher_type": "Invoice Form", "voucher_no": voucher_no}, fields=["*"]
+	)
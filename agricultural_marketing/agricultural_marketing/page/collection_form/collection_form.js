@@ -179,25 +179,12 @@ frappe.pages['collection-form'].on_page_load = function(wrapper) {
             final_filters[key] = filters[key].value;
         }
         validateMandatoryFilters(final_filters);
-        frappe.call({
-            method: 'agricultural_marketing.agricultural_marketing.page.collection_form.collection_form.execute',
-            args : {
-                filters: final_filters
-            },
-            callback: function (r) {
-                if (r.message.file_url) {
-                    downloadFiles(r.message.file_url);
-                    frappe.dom.unfreeze();
-                } else if (r.message.error) {
-                    frappe.dom.unfreeze();
-                    frappe.throw({
-                        title : __("No Data"),
-                        indicator: "blue",
-                        message: __(r.message.error)
-                    });
-                }
-            },
+        // The PDF is streamed in the response, no File is saved for it
+        open_url_post(frappe.request.url, {
+            cmd: 'agricultural_marketing.agricultural_marketing.page.collection_form.collection_form.download_report',
+            filters: JSON.stringify(final_filters),
         });
+        frappe.dom.unfreeze();
     }
 
 
@@ -232,16 +219,6 @@ frappe.pages['collection-form'].on_page_load = function(wrapper) {
         });
     }
 
-    async function downloadFiles(file_url) {
-        await new Promise((resolve, reject) => {
-            open_url_post(frappe.request.url, {
-                cmd: 'frappe.core.doctype.file.file.download_file',
-                file_url: file_url,
-            });
-            setTimeout(resolve, 2000);  // Wait for 2 second before downloading the next file
-        });
-    }
-
     function validateMandatoryFilters(filters) {
         error = [];
         if (!filters['company']) {
@@ -263,7 +240,67 @@ frappe.pages['collection-form'].on_page_load = function(wrapper) {
             })
         }
     }
+    const stageLabels = {
+        query: __('Querying Transactions'),
+        aggregate: __('Calculating Balances'),
+        render: __('Rendering Report'),
+        pdf: __('Generating PDF')
+    };
+    let runningJob = null;
+
+    frappe.realtime.on('collection_form_progress', (data) => {
+        if (data.report_id != runningJob) return;
+        frappe.show_progress(__('Collection Form'), data.done, data.total, stageLabels[data.stage]);
+    });
+
+    frappe.realtime.on('collection_form_done', (data) => {
+        if (data.report_id != runningJob) return;
+        runningJob = null;
+        page.remove_inner_button(__('Cancel'));
+        frappe.hide_progress();
+        if (data.file_url) {
+            open_url_post(frappe.request.url, {
+                cmd: 'frappe.core.doctype.file.file.download_file',
+                file_url: data.file_url,
+            });
+        } else if (data.cancelled) {
+            frappe.show_alert({message: __('Collection form cancelled'), indicator: 'orange'});
+        } else if (data.error) {
+            frappe.throw(__(data.error));
+        }
+    });
+
+    function enqueue_report(filters) {
+        var final_filters = {};
+        for (let key in filters) {
+            final_filters[key] = filters[key].value;
+        }
+        validateMandatoryFilters(final_filters);
+        frappe.call({
+            method: 'agricultural_marketing.agricultural_marketing.page.collection_form.collection_form.enqueue_report',
+            args : {
+                filters: final_filters
+            },
+            callback: function (r) {
+                runningJob = r.message.report_id;
+                frappe.show_progress(__('Collection Form'), 0, 4, __('Queued'));
+                page.add_inner_button(__('Cancel'), () => { cancel_report() });
+            },
+        });
+    }
+
+    function cancel_report() {
+        if (!runningJob) return;
+        frappe.call({
+            method: 'agricultural_marketing.agricultural_marketing.page.collection_form.collection_form.cancel_report',
+            args : {
+                report_id: runningJob
+            },
+        });
+    }
+
     let $btn = page.set_primary_action( __('Generate Collection Form'), () => { get_data(page.fields_dict) });
+    page.add_inner_button(__('Generate in Background'), () => { enqueue_report(page.fields_dict) });
     let $btnPDF = page.set_secondary_action( __('Open PDF'), () => { open_pdf(page.fields_dict) });
 
 }
\ No newline at end of file
@@ -1,27 +1,138 @@
 import json
-import os
-import random
 
 import frappe
 from frappe import _, cint
 from frappe.utils import getdate, flt
 from frappe.utils.jinja_globals import is_rtl
-from frappe.utils.pdf import get_pdf as _get_pdf
-from frappe.query_builder.functions import Sum
 from pypika import Case
 from pypika.terms import Term
 from frappe.contacts.doctype.address.address import get_company_address
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+from agricultural_marketing.utils.opening_balance import (get_draft_total, get_draft_totals, get_opening_balance,
+                                                          get_opening_balances)
+from agricultural_marketing.utils.party_scope import get_party_scope
+from agricultural_marketing.utils.pdf_backend import get_pdf as _get_pdf
+from agricultural_marketing.utils.print_templates import render_template
+from agricultural_marketing.utils.running_balance import (compare_engines, compare_period_totals, get_ledger,
+                                                          get_ledger_totals, use_sql_engine)
+from agricultural_marketing.utils.report_output import save_file
+from agricultural_marketing.utils.taxes import get_tax_rate
+
+# Stages of a background collection form job, in order
+REPORT_STAGES = ("query", "aggregate", "render", "pdf")
+
+
+class ReportCancelled(Exception):
+    pass
 
 
 @frappe.whitelist()
 def execute(filters):
-    data = frappe._dict()
-    file_urls = []
+    """Returns the collection form HTML, the PDF is streamed by `download_report`."""
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+
+    return {
+        "html": get_report_html(filters)
+    }
+
+
+@frappe.whitelist()
+def download_report(filters):
+    """Stream the collection form PDF directly in the response, without saving a File."""
     if isinstance(filters, str):
         filters = json.loads(filters)
 
+    file_date = filters.get("to_date") or filters.get("from_date")
+    frappe.local.response.filename = "collection-form-{0}.pdf".format(file_date)
+    frappe.local.response.filecontent = _get_pdf(get_report_html(filters), {"orientation": "Portrait"})
+    frappe.local.response.type = "download"
+
+
+@frappe.whitelist()
+def enqueue_report(filters):
+    """Generate the collection form in a background job, progress and result are published over realtime."""
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+
+    if filters.get("from_date") and filters.get("to_date") and (filters.get("to_date") < filters.get("from_date")):
+        frappe.throw(_("To date must be after from date"))
+
+    # `job_id` is consumed by frappe.enqueue itself, the job gets its own `report_id` for cancelling and realtime
+    report_id = frappe.generate_hash(length=10)
+    frappe.enqueue(
+        "agricultural_marketing.agricultural_marketing.page.collection_form.collection_form.make_report",
+        queue="long",
+        timeout=7200,
+        job_id="collection_form::{0}".format(report_id),
+        report_id=report_id,
+        filters=filters
+    )
+    return {
+        "report_id": report_id
+    }
+
+
+@frappe.whitelist()
+def cancel_report(report_id):
+    """Ask a running collection form job of the current user to stop, the job checks it between stages."""
+    frappe.cache.set_value(get_cancel_key(report_id), 1, expires_in_sec=7200)
+
+
+def make_report(filters, report_id):
+    def on_stage(stage):
+        if frappe.cache.exists(cancel_key):
+            raise ReportCancelled
+
+        frappe.publish_realtime("collection_form_progress", {
+            "report_id": report_id,
+            "stage": stage,
+            "done": REPORT_STAGES.index(stage),
+            "total": len(REPORT_STAGES)
+        }, user=frappe.session.user)
+
+    # Replaced on success or cancel, so the page is always released when the job ends
+    result = {"error": "Generating the collection form failed, please check the Error Log"}
+    cancel_key = get_cancel_key(report_id)
+    try:
+        html = get_report_html(filters, on_stage)
+        on_stage("pdf")
+        content = _get_pdf(html, {"orientation": "Portrait"})
+        result = {"file_url": save_file("collection-form.pdf", content, is_private=1)}
+        delete_previous_reports(result["file_url"])
+    except ReportCancelled:
+        result = {"cancelled": 1}
+    except Exception:
+        frappe.log_error(title=_("Generating the collection form failed"))
+    finally:
+        frappe.cache.delete_value(cancel_key)
+        result["report_id"] = report_id
+        frappe.publish_realtime("collection_form_done", result, user=frappe.session.user)
+
+
+def delete_previous_reports(file_url):
+    """Each run saves a new private File, the ones of the user's earlier runs are superseded and deleted."""
+    for name in frappe.get_all("File", filters={
+        "owner": frappe.session.user,
+        "is_private": 1,
+        "attached_to_doctype": ("is", "not set"),
+        "file_name": ("like", "collection-form-%.pdf"),
+        "file_url": ("!=", file_url)
+    }, pluck="name"):
+        frappe.delete_doc("File", name, ignore_permissions=True)
+
+
+def get_cancel_key(report_id):
+    return "collection_form_cancel::{0}::{1}".format(frappe.session.user, report_id)
+
+
+def get_report_html(filters, on_stage=None):
+    data = frappe._dict()
     # Get Data
-    data = get_data(data, filters)
+    data = get_data(data, filters, on_stage)
+    if on_stage:
+        on_stage("render")
     company_defaults = frappe.get_doc("Company", filters.get('company')).as_dict()
     letter_head = None
     default_letter_head = company_defaults["default_letter_head"]
@@ -31,8 +142,7 @@ def execute(filters):
         company_defaults["address"] = get_company_address(company_defaults['name']).get("company_address_display")
         company_defaults["image"] = frappe.db.get_value("File", {"attached_to_name": company_defaults['name']},
                                                         "file_url")
-    html_format = get_html_format(filters.get("new_layout"))
-    font_size = frappe.db.get_single_value("Agriculture Settings", "font_size") or 14
+    font_size = get_agriculture_settings().get("font_size") or 14
 
     context = {
         "letter_head": letter_head,
@@ -44,43 +154,28 @@ def execute(filters):
         "font_size": font_size
     }
 
-    html = frappe.render_template(html_format, context)
-    if filters.get("open_pdf"):
-        return {"html": html}
-    content = _get_pdf(html, {"orientation": "Portrait"})
-    file_name = "{0}-{1}.pdf".format("collection-form", str(random.randint(1000, 9999)))
-    file_doc = frappe.new_doc("File")
-    file_doc.update({
-        "file_name": file_name,
-        "is_private": 0,
-        "content": content
-    })
-    file_doc.save(ignore_permissions=True)
+    return render_template(get_template_name(filters.get("new_layout")), context)
 
-    return {
-        "file_url": file_doc.file_url
-    }
 
-
-def get_data(data, filters):
-    invoices_details = get_items_details(filters)
-    payments_details = get_payments_details(filters)
-    process_result(invoices_details, payments_details, data)
+def get_data(data, filters, on_stage=None):
+    if on_stage:
+        on_stage("query")
+    if use_sql_engine():
+        data = get_ledger_data(data, filters)
+    else:
+        invoices_details = get_items_details(filters)
+        payments_details = get_payments_details(filters)
+        process_result(invoices_details, payments_details, data)
+    if on_stage:
+        on_stage("aggregate")
     data = get_party_summary(filters=filters, party_type=filters.get("party_type"), data=data)
     return data
 
 
-def get_html_format(new_layout=False):
+def get_template_name(new_layout=False):
     if new_layout:
-        template_filename = os.path.join("collection_form_new" + '.html')
-    else:
-        template_filename = os.path.join("collection_form" + '.html')
-    folder = os.path.dirname(frappe.get_module("agricultural_marketing" + "." + "agricultural_marketing" +
-                                               "." + "page").__file__)
-    doctype_path = os.path.join(folder, "collection_form")
-    paths_temp = os.path.join(doctype_path, template_filename)
-    html_format = frappe.utils.get_html_format(paths_temp)
-    return html_format
+        return "page/collection_form/collection_form_new"
+    return "page/collection_form/collection_form"
 
 
 def get_items_details(filters):
@@ -90,10 +185,9 @@ def get_items_details(filters):
         invformitem.parent == invform.name).where(invform.company == filters.get('company'))
 
     # Determine and apply party filters based on party type
-    _filters = {"is_customer": 1} if filters.get("party_type") == "Customer" else {}
     _field = invformitem.customer if filters.get("party_type") == "Customer" else invform.supplier
-    parties = get_parties(filters, _filters)
-    items_query = items_query.where(_field.isin(parties))
+    party_scope = get_party_scope(filters)
+    items_query = party_scope.apply(items_query, _field)
 
     # validate and apply dates filters
     items_query = validate_and_apply_date_filters(filters, items_query, invform)
@@ -110,6 +204,7 @@ def get_items_details(filters):
     result = items_query.orderby(invform.posting_date).orderby(invform.name).orderby(
         invformitem.item_name).run(as_dict=True)
 
+    parties = party_scope.get_parties()
     if not result:
         for party in parties:
             result.append({"party": party})
@@ -127,9 +222,7 @@ def get_payments_details(filters):
     payments_query = frappe.qb.from_(entry).where(entry.company == filters.get('company'))
 
     # Determine and apply party filters based on party type
-    _filters = {"is_customer": 1} if filters.get("party_type") == "Customer" else {}
-    parties = get_parties(filters, _filters)
-    payments_query = payments_query.where(entry.party.isin(parties))
+    payments_query = get_party_scope(filters).apply(payments_query, entry.party)
 
     # Validate and apply dates filters
     payments_query = validate_and_apply_date_filters(filters, payments_query, entry)
@@ -148,6 +241,27 @@ def get_payments_details(filters):
     return result
 
 
+def get_ledger_data(data, filters):
+    """The rows of every party in scope from the SQL ledger, parties without transactions get an empty list."""
+    party_scope = get_party_scope(filters)
+    ledger = get_ledger(filters, party_scope)
+    for party in sorted(party_scope.get_parties()):
+        data[party] = ledger.get(party, [])
+
+    return data
+
+
+def get_period_totals(party_data, filters, tax_rate):
+    """Returns the sales, commission (with taxes) and payments totals of a party, summed over its rows."""
+    invoices = [d for d in party_data if d.get("doctype") == "Invoice Form"]
+    commission = sum(flt(d.commission) for d in invoices) if filters.get("party_type") == "Supplier" else 0
+    return frappe._dict({
+        "sales": sum(flt(d.total) for d in invoices),
+        "commission": commission + (commission * tax_rate) / 100,
+        "payments": sum(flt(d.paid_amount) for d in party_data if d.get("doctype") == "Payment Entry")
+    })
+
+
 def get_party_summary(filters, party_type, data):
     def append_summary(doctype, reference_id, date, qty, price, statement, debit, credit):
         nonlocal last_balance
@@ -169,47 +283,25 @@ def get_party_summary(filters, party_type, data):
     hide_decimal = True if filters.get("hide_decimal") else False
     switch_columns = True if party_type == "Customer" else False
     from_date = filters.get('from_date')
+    tax_rate = get_tax_rate()
+    party_scope = get_party_scope(filters)
+    opening_balances = get_opening_balances(party_type, party_scope, from_date)
+    draft_totals = get_draft_totals(filters, party_scope) if filters.get("consider_draft") else {}
+    sql_engine = use_sql_engine()
+    ledger = get_ledger(filters, party_scope) if compare_engines() else None
     for party, party_data in data.items():
-        debit, credit, last_balance = 0, 0, 0
-        total_debit, total_credit = 0, 0
-        gl_filters = {
-            "party_type": filters.get("party_type"),
-            "party": party,
-            "from_date": from_date
-        }
-
-        q = """ 
-                SELECT 
-                    name, debit, credit, posting_date
-                FROM 
-                    `tabGL Entry`
-                WHERE 
-                    party_type=%(party_type)s 
-                AND 
-                    party=%(party)s 
-                AND 
-                    is_cancelled = 0
-                AND 
-                (posting_date < %(from_date)s OR is_opening = 'Yes')
-            """
-
-        gl_entries = frappe.db.sql(q, gl_filters, as_dict=True)
-
-        for gl in gl_entries:
-            debit += gl.debit
-            credit += gl.credit
+        last_balance = 0
+        debit, credit = get_opening_balance(opening_balances, party)
 
         # GET total items and payments before from date
         if filters.get("consider_draft"):
-            total_items = get_draft_total_items(filters, party) or 0
-            total_payments = get_draft_total_payments(filters, party) or 0
+            draft_total = get_draft_total(draft_totals, party)
             if filters.get("party_type") == "Supplier":
-                total_draft_commission = get_draft_total_commission(filters, party) or 0
-                debit += total_payments + total_draft_commission
-                credit += total_items
+                debit += draft_total.payments + draft_total.commission
+                credit += draft_total.items
             else:
-                debit += total_items
-                credit += total_payments
+                debit += draft_total.items
+                credit += draft_total.payments
 
         last_balance = debit - credit
         if abs(debit) > abs(credit):
@@ -233,12 +325,10 @@ def get_party_summary(filters, party_type, data):
             if d.get("doctype") == "Invoice Form":
                 commission_with_taxes = 0
                 if filters.get("party_type") == "Supplier" and d.commission:
-                    total_taxes = (d.commission * get_tax_rate()) / 100
+                    total_taxes = (d.commission * tax_rate) / 100
                     commission_with_taxes = d.commission + total_taxes
                 append_summary(d.doctype, d.reference_id, d.date, d.qty, d.price, d.item_name, commission_with_taxes,
                                d.total)
-                total_credit += d.total
-                total_debit += commission_with_taxes
             elif d.get("doctype") == "Payment Entry":
                 statement = f"{_(d.mop)} - {d.remarks}" if d.remarks else f"{_(d.mop)}"
                 if d.payment_type == "Receive":
@@ -248,9 +338,15 @@ def get_party_summary(filters, party_type, data):
                     append_summary(d.doctype, d.reference_id, d.date, "", "",
                                    statement, abs(flt(d.paid_amount, 2)), 0)
 
-                total_debit += d.paid_amount
-
-        # Calculate and append closing
+        # Calculate and append closing, the SQL ledger carries the running totals on its last row
+        if sql_engine:
+            period_totals = get_ledger_totals(party_data)
+        else:
+            period_totals = get_period_totals(party_data, filters, tax_rate)
+            if ledger is not None:
+                compare_period_totals(party, period_totals, get_ledger_totals(ledger.get(party)))
+        total_debit = period_totals.commission + period_totals.payments
+        total_credit = period_totals.sales
         if switch_columns:
             total_debit, total_credit = total_credit, total_debit
 
@@ -272,19 +368,6 @@ def get_party_summary(filters, party_type, data):
     return final_data
 
 
-def get_parties(filters, _filters):
-    if filters.get("party"):
-        parties = [filters.get("party")]
-    elif filters.get("party_group"):
-        party_group = "customer_group" if filters.get('party_type') == "Customer" else "supplier_group"
-        _filters[party_group] = filters.get('party_group')
-        parties = frappe.db.get_all(filters.get("party_type"), _filters, pluck="name")
-    else:
-        parties = frappe.db.get_all(filters.get("party_type"), _filters, pluck="name")
-
-    return parties
-
-
 def validate_and_apply_date_filters(filters, query, doctype):
     if filters.get("from_date") and filters.get("to_date") and (filters.get("to_date") < filters.get("from_date")):
         frappe.throw(_("To date must be after from date"))
@@ -348,80 +431,3 @@ def process_result_and_totals_for_payments(result, data):
             if party not in data:
                 data[party] = {"payments": []}
             data.setdefault(party, {}).setdefault("payments", []).append(row)
-
-
-def get_tax_rate():
-    default_tax_template = frappe.db.get_single_value("Agriculture Settings", "default_tax")
-
-    if not default_tax_template:
-        default_tax_template = frappe.db.get_value("Sales Taxes and Charges",
-                                                   {"is_default": 1}, "name")
-
-    tax_rate = frappe.db.get_value("Sales Taxes and Charges",
-                                   {"parent": default_tax_template}, "rate") or 0
-    return tax_rate
-
-
-def get_draft_total_items(filters, party):
-    invform = frappe.qb.DocType("Invoice Form")
-    invformitem = frappe.qb.DocType("Invoice Form Item")
-    items_query = frappe.qb.from_(invform).left_join(invformitem).on(
-        invformitem.parent == invform.name).where(invform.company == filters.get('company'))
-
-    # Determine and apply party filters based on party type
-    _field = invformitem.customer if filters.get("party_type") == "Customer" else invform.supplier
-    items_query = items_query.where(_field == party)
-
-    items_query = items_query.where(invform.docstatus == 0).where(invform.posting_date.lt(filters.get("from_date")))
-
-    # Select relative fields based on party type
-    result = items_query.select(Sum(invformitem.total).as_("total")).run(as_dict=True)
-
-    total_items = sum([re["total"] for re in result if re["total"]]) or 0
-
-    return total_items
-
-
-def get_draft_total_commission(filters, party):
-    invform = frappe.qb.DocType("Invoice Form")
-    result = frappe.qb.from_(invform).where(invform.company == filters.get('company')).where(
-        invform.supplier == party).where(invform.docstatus == 0).where(
-        invform.posting_date.lt(filters.get("from_date"))).select(
-        Sum(invform.total_commissions_and_taxes).as_("commission")).run(
-        as_dict=True)
-
-    total_commission = sum([re["commission"] for re in result if re["commission"]]) or 0
-
-    return total_commission
-
-
-def get_draft_total_payments(filters, party):
-    entry = frappe.qb.DocType("Payment Entry")
-    payments_query = frappe.qb.from_(entry).where(
-        entry.company == filters.get('company')).where(
-        entry.party == party).where(
-        entry.posting_date.lt(filters.get("from_date"))).where(
-        entry.docstatus == 0
-    )
-
-    payments_query = payments_query.select(entry.payment_type)
-
-    # Conditionally select paid amount based on party type and payment type
-    if filters.get("party_type") == "Supplier":
-        payments_query = payments_query.select(
-            Case().when(entry.payment_type == "Pay", Sum(entry.paid_amount)).
-            when(entry.payment_type == "Receive", (Sum(entry.paid_amount * -1))).
-            else_(Sum(entry.paid_amount)).as_("paid_amount")
-        )
-    elif filters.get("party_type") == "Customer":
-        payments_query = payments_query.select(
-            Case().when(entry.payment_type == "Receive", Sum(entry.paid_amount)).
-            when(entry.payment_type == "Pay", (Sum(entry.paid_amount * -1))).
-            else_(Sum(entry.paid_amount)).as_("paid_amount")
-        )
-
-    result = payments_query.run(as_dict=True)
-
-    total_paid_amount = sum([re["paid_amount"] for re in result if re["paid_amount"]]) or 0
-
-    return total_paid_amount
@@ -1,23 +1,59 @@
 import json
-import os
-import random
 import frappe
 from frappe import _, cint
 from frappe.utils import getdate, flt
 from frappe.utils.jinja_globals import is_rtl
-from frappe.utils.pdf import get_pdf as _get_pdf
 from frappe.query_builder.functions import Sum
 from pypika import Case
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+from agricultural_marketing.utils.opening_balance import (get_draft_total, get_draft_totals, get_opening_balance,
+                                                          get_opening_balances)
+from agricultural_marketing.utils.party_scope import get_party_scope
+from agricultural_marketing.utils.pdf_pool import render_pdfs
+from agricultural_marketing.utils.print_templates import render_template
+from agricultural_marketing.utils.report_output import save_report_output
+from agricultural_marketing.utils.taxes import get_tax_rate
 
 
 @frappe.whitelist()
 def get_reports(filters):
-    data = frappe._dict()
-    file_urls = []
-    letter_head = None
     if isinstance(filters, str):
         filters = json.loads(filters)
 
+    if filters.get("from_date") and filters.get("to_date") and (filters.get("to_date") < filters.get("from_date")):
+        frappe.throw(_("To date must be after from date"))
+
+    job = frappe.enqueue(
+        "agricultural_marketing.agricultural_marketing.page.detailed_report.detailed_report.make_reports",
+        queue="long",
+        timeout=7200,
+        filters=filters
+    )
+    return {
+        "job_id": job.id
+    }
+
+
+def make_reports(filters):
+    """Background job rendering a pdf per party, progress and result are published to the user over realtime."""
+    try:
+        result = build_reports(filters)
+    except Exception:
+        frappe.log_error(title=_("Generating reports failed"))
+        result = {"error": "Generating the reports failed, please check the Error Log"}
+
+    frappe.publish_realtime("detailed_report_done", result, user=frappe.session.user)
+
+
+def build_reports(filters):
+    def publish_progress(stage, done, total):
+        frappe.publish_realtime("detailed_report_progress", {"stage": stage, "done": done, "total": total},
+                                user=frappe.session.user)
+
+    data = frappe._dict()
+    letter_head = None
+
     default_letter_head = frappe.get_value("Company", filters.get("company"), "default_letter_head")
     if default_letter_head:
         letter_head = frappe.get_doc("Letter Head", default_letter_head)
@@ -28,15 +64,19 @@ def get_reports(filters):
         return {
             "error": "No data matches the chosen criteria"
         }
-    html_format = get_html_format()
+    font_size = get_agriculture_settings().get("font_size") or 14
 
+    party_scope = get_party_scope(filters)
+    opening_balances = get_opening_balances(filters.get("party_type"), party_scope, filters.get("from_date"))
+    draft_totals = get_draft_totals(filters, party_scope) if filters.get("consider_draft") else {}
+    documents = []
     for key, value in data.items():
         # Get summary table data
         party_summary = get_party_summary(filters=filters, party_type=filters.get("party_type"), party=key,
-                                          party_data=value)
+                                          party_data=value, opening_balances=opening_balances,
+                                          draft_totals=draft_totals)
 
         header_details = get_header_data(filters.get("party_group"), key)
-        font_size = frappe.db.get_single_value("Agriculture Settings", "font_size") or 14
         context = {
             "letter_head": letter_head,
             "header": header_details,
@@ -49,17 +89,12 @@ def get_reports(filters):
             "font_size": font_size
         }
 
-        html = frappe.render_template(html_format, context)
-        content = _get_pdf(html, {"orientation": "Portrait"})
-        file_name = "{0}-{1}.pdf".format(key, str(random.randint(1000, 9999)))
-        file_doc = frappe.new_doc("File")
-        file_doc.update({
-            "file_name": file_name,
-            "is_private": 0,
-            "content": content
-        })
-        file_doc.save(ignore_permissions=True)
-        file_urls.append(file_doc.file_url)
+        documents.append((key, render_template("page/detailed_report/detailed_report", context)))
+        publish_progress("render", len(documents), len(data))
+
+    documents = render_pdfs(documents, {"orientation": "Portrait"},
+                            on_progress=lambda done, total: publish_progress("pdf", done, total))
+    file_urls = save_report_output(documents, filters.get("output"), "detailed-report")
 
     return {
         "file_urls": file_urls
@@ -79,10 +114,8 @@ def get_items_details(data, filters):
         invformitem.parent == invform.name).where(invform.company == filters.get('company'))
 
     # Determine and apply party filters based on party type
-    _filters = {"is_customer": 1} if filters.get("party_type") == "Customer" else {}
     _field = invformitem.customer if filters.get("party_type") == "Customer" else invform.supplier
-    parties = get_parties(filters, _filters)
-    items_query = items_query.where(_field.isin(parties))
+    items_query = get_party_scope(filters).apply(items_query, _field)
 
     # validate and apply dates filters
     items_query = validate_and_apply_date_filters(filters, items_query, invform)
@@ -111,9 +144,7 @@ def get_payments_details(data, filters):
     payments_query = frappe.qb.from_(entry).where(entry.company == filters.get('company'))
 
     # Determine and apply party filters based on party type
-    _filters = {"is_customer": 1} if filters.get("party_type") == "Customer" else {}
-    parties = get_parties(filters, _filters)
-    payments_query = payments_query.where(entry.party.isin(parties))
+    payments_query = get_party_scope(filters).apply(payments_query, entry.party)
 
     # Validate and apply dates filters
     payments_query = validate_and_apply_date_filters(filters, payments_query, entry)
@@ -136,7 +167,7 @@ def get_payments_details(data, filters):
     return data
 
 
-def get_party_summary(filters, party_type, party, party_data):
+def get_party_summary(filters, party_type, party, party_data, opening_balances, draft_totals):
     def update_balance(balance, debit, credit):
         """Helper function to calculate and update the balance."""
         return balance + flt(debit) - flt(credit)
@@ -166,46 +197,18 @@ def get_party_summary(filters, party_type, party, party_data):
     switch_columns = True if party_type == "Customer" else False
     party_summary = []
     debit, credit, last_balance, balance_from, balance_to = 0, 0, 0, 0, 0
-    from_date = filters.get('from_date')
 
-    gl_filters = {
-        "party_type": filters.get("party_type"),
-        "party": party,
-        "from_date": from_date
-    }
-
-    q = """ 
-            SELECT 
-                name, debit, credit, posting_date
-            FROM 
-                `tabGL Entry`
-            WHERE 
-                party_type=%(party_type)s 
-            AND 
-                party=%(party)s 
-            AND 
-                is_cancelled = 0
-            AND 
-            (posting_date < %(from_date)s OR is_opening = 'Yes')
-        """
-
-    gl_entries = frappe.db.sql(q, gl_filters, as_dict=True)
-
-    for gl in gl_entries:
-        debit += gl.debit
-        credit += gl.credit
+    debit, credit = get_opening_balance(opening_balances, party)
 
     # GET total items and payments before from date
     if filters.get("consider_draft"):
-        total_items = get_draft_total_items(filters, party) or 0
-        total_payments = get_draft_total_payments(filters, party) or 0
+        draft_total = get_draft_total(draft_totals, party)
         if filters.get("party_type") == "Supplier":
-            total_draft_commission = get_draft_total_commission(filters, party) or 0
-            debit += total_payments + total_draft_commission
-            credit += total_items
+            debit += draft_total.payments + draft_total.commission
+            credit += draft_total.items
         else:
-            debit += total_items
-            credit += total_payments
+            debit += draft_total.items
+            credit += draft_total.payments
 
     last_balance = debit - credit
     # Append Opening
@@ -286,28 +289,6 @@ def get_party_summary(filters, party_type, party, party_data):
     return party_summary
 
 
-def get_html_format():
-    template_filename = os.path.join("detailed_report" + '.html')
-    folder = os.path.dirname(frappe.get_module("agricultural_marketing" + "." + "agricultural_marketing" +
-                                               "." + "page").__file__)
-    doctype_path = os.path.join(folder, "detailed_report")
-    paths_temp = os.path.join(doctype_path, template_filename)
-    html_format = frappe.utils.get_html_format(paths_temp)
-    return html_format
-
-
-def get_tax_rate():
-    default_tax_template = frappe.db.get_single_value("Agriculture Settings", "default_tax")
-
-    if not default_tax_template:
-        default_tax_template = frappe.db.get_value("Sales Taxes and Charges",
-                                                   {"is_default": 1}, "name")
-
-    tax_rate = frappe.db.get_value("Sales Taxes and Charges",
-                                   {"parent": default_tax_template}, "rate") or 0
-    return tax_rate
-
-
 def get_header_data(party_group, party):
     return {
         "party": party,
@@ -315,19 +296,6 @@ def get_header_data(party_group, party):
     }
 
 
-def get_parties(filters, _filters):
-    if filters.get("party"):
-        parties = [filters.get("party")]
-    elif filters.get("party_group"):
-        party_group = "customer_group" if filters.get('party_type') == "Customer" else "supplier_group"
-        _filters[party_group] = filters.get('party_group')
-        parties = frappe.db.get_all(filters.get("party_type"), _filters, pluck="name")
-    else:
-        parties = frappe.db.get_all(filters.get("party_type"), _filters, pluck="name")
-
-    return parties
-
-
 def validate_and_apply_date_filters(filters, query, doctype):
     if filters.get("from_date") and filters.get("to_date") and (filters.get("to_date") < filters.get("from_date")):
         frappe.throw(_("To date must be after from date"))
@@ -358,29 +326,20 @@ def select_fields_for_invoices(filters, items_query, _field, invform, invformite
 
 
 def process_result_and_totals_for_invoices(result, data, filters):
-    def calculate_totals(items):
-        """Calculate the total quantities, before tax, commission, and taxes."""
-        total_qty = sum([it.get('qty') for it in items if it.get('qty')])
-        total_before_tax = sum([it.get('total') for it in items if it.get('total')])
-        total_commission = sum([it.get('commission') for it in items])
-        total_taxes = (total_commission * get_tax_rate()) / 100 if total_commission else 0
-        total_commission_with_taxes = total_commission + total_taxes
-        return total_qty, total_before_tax, total_commission, total_taxes, total_commission_with_taxes
-
-    invoices = set()
+    # When neglecting items, the lines of an invoice are merged into its first row, keyed by (party, invoice_id)
+    invoice_rows = {}
     for row in result:
         party = row.pop("party")  # Extract and remove party from the row
-        invoice_id = row.get("invoice_id")
-        if invoice_id in invoices and filters.get("neglect_items"):
-            for d in data[party]["items"]:
-                if d["invoice_id"] == invoice_id:
-                    d["total"] += row["total"]
-                    if filters.get("party_type") == "Supplier":
-                        d["commission"] += row["commission"]
-                    break
-        else:
-            data.setdefault(party, {}).setdefault("items", []).append(row)
-            invoices.add(row["invoice_id"])
+        if filters.get("neglect_items"):
+            invoice_row = invoice_rows.get((party, row["invoice_id"]))
+            if invoice_row:
+                invoice_row["total"] += row["total"]
+                if filters.get("party_type") == "Supplier":
+                    invoice_row["commission"] += row["commission"]
+                continue
+            invoice_rows[(party, row["invoice_id"])] = row
+
+        data.setdefault(party, {}).setdefault("items", []).append(row)
 
 
 def select_fields_for_payment(filters, payments_query, entry):
@@ -426,58 +385,6 @@ def process_result_and_totals_for_payments(result, data):
             append_to_date(party, row)
 
 
-def get_draft_total_items(filters, party):
-    invform = frappe.qb.DocType("Invoice Form")
-    invformitem = frappe.qb.DocType("Invoice Form Item")
-    items_query = frappe.qb.from_(invform).left_join(invformitem).on(
-        invformitem.parent == invform.name).where(invform.company == filters.get('company'))
-
-    # Determine and apply party filters based on party type
-    _field = invformitem.customer if filters.get("party_type") == "Customer" else invform.supplier
-    items_query = items_query.where(_field == party)
-
-    items_query = items_query.where(invform.docstatus == 0).where(invform.posting_date.lt(filters.get("from_date")))
-
-    # Select relative fields based on party type
-    result = items_query.select(Sum(invformitem.total).as_("total")).run(as_dict=True)
-
-    total_items = sum([re["total"] for re in result if re["total"]]) or 0
-
-    return total_items
-
-
-def get_draft_total_payments(filters, party):
-    entry = frappe.qb.DocType("Payment Entry")
-    payments_query = frappe.qb.from_(entry).where(
-        entry.company == filters.get('company')).where(
-        entry.party == party).where(
-        entry.posting_date.lt(filters.get("from_date"))).where(
-        entry.docstatus == 0
-    )
-
-    payments_query = payments_query.select(entry.payment_type)
-
-    # Conditionally select paid amount based on party type and payment type
-    if filters.get("party_type") == "Supplier":
-        payments_query = payments_query.select(
-            Case().when(entry.payment_type == "Pay", Sum(entry.paid_amount)).
-            when(entry.payment_type == "Receive", (Sum(entry.paid_amount * -1))).
-            else_(Sum(entry.paid_amount)).as_("paid_amount")
-        )
-    elif filters.get("party_type") == "Customer":
-        payments_query = payments_query.select(
-            Case().when(entry.payment_type == "Receive", Sum(entry.paid_amount)).
-            when(entry.payment_type == "Pay", (Sum(entry.paid_amount * -1))).
-            else_(Sum(entry.paid_amount)).as_("paid_amount")
-        )
-
-    result = payments_query.run(as_dict=True)
-
-    total_paid_amount = sum([re["paid_amount"] for re in result if re["paid_amount"]]) or 0
-
-    return total_paid_amount
-
-
 def get_opening_from_sales_invoice_for_customer(filters, party, debit):
     # Get total commission from submitted invoice form which have no commission invoices before the selected date
     invform = frappe.qb.DocType("Invoice Form")
@@ -500,17 +407,4 @@ def get_opening_from_sales_invoice_for_customer(filters, party, debit):
         sinv.posting_date.lt(filters.get("from_date"))).select(sinv.grand_total.as_("total")).run(as_dict=True)
     debit += sum([re["total"] for re in sinv_result if re["total"]]) or 0
 
-    return debit
-
-
-def get_draft_total_commission(filters, party):
-    invform = frappe.qb.DocType("Invoice Form")
-    result = frappe.qb.from_(invform).where(invform.company == filters.get('company')).where(
-        invform.supplier == party).where(invform.docstatus == 0).where(
-        invform.posting_date.lt(filters.get("from_date"))).select(
-        Sum(invform.total_commissions_and_taxes).as_("commission")).run(
-        as_dict=True)
-
-    total_commission = sum([re["commission"] for re in result if re["commission"]]) or 0
-
-    return total_commission
\ No newline at end of file
+    return debit
\ No newline at end of file
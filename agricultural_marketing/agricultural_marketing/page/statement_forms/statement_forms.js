@@ -32,6 +32,15 @@ frappe.pages['statement-forms'].on_page_load = function(wrapper) {
 	});
     neglectItems.$wrapper.addClass('col-md-4');
 
+    let output = page.add_field({
+	    label: __('Output'),
+	    fieldtype: 'Select',
+	    fieldname: 'output',
+	    options: ['Separate Files', 'Merged PDF', 'ZIP Archive'],
+	    default: 'Separate Files'
+	});
+    output.$wrapper.addClass('col-md-4');
+
     let company = page.add_field({
 	    label: 'Company',
 	    fieldtype: 'Link',
@@ -158,6 +167,25 @@ frappe.pages['statement-forms'].on_page_load = function(wrapper) {
 	});
     partyTypeField.$wrapper.removeClass('col-md-2').addClass('col-md-4');
 
+    frappe.realtime.on('statement_forms_progress', (data) => {
+        let title = data.stage == 'pdf' ? __('Generating PDFs') : __('Preparing Reports');
+        frappe.show_progress(title, data.done, data.total, __('{0} of {1}', [data.done, data.total]));
+    });
+
+    frappe.realtime.on('statement_forms_done', (data) => {
+        frappe.hide_progress();
+        frappe.dom.unfreeze();
+        if (data.file_urls) {
+            downloadFiles(data.file_urls);
+        } else if (data.error) {
+            frappe.throw({
+                title : __("No Data"),
+                indicator: "blue",
+                message: __(data.error)
+            });
+        }
+    });
+
     function get_reports(filters) {
         frappe.dom.freeze('Processing...');
         var final_filters = {};
@@ -171,17 +199,12 @@ frappe.pages['statement-forms'].on_page_load = function(wrapper) {
                 filters: final_filters
             },
             callback: function (r) {
-                if (r.message.file_urls) {
-                    downloadFiles(r.message.file_urls);
-                    frappe.dom.unfreeze();
-                } else if (r.message.error) {
-                    frappe.dom.unfreeze();
-                    frappe.throw({
-                        title : __("No Data"),
-                        indicator: "blue",
-                        message: __(r.message.error)
-                    });
-                }
+                // The reports are generated in the background, the result arrives over realtime
+                frappe.dom.unfreeze();
+                frappe.show_alert({message: __('Generating reports in the background'), indicator: 'blue'});
+            },
+            error: function () {
+                frappe.dom.unfreeze();
             },
         });
     }
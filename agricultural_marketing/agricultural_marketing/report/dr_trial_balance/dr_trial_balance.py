@@ -4,6 +4,7 @@
 import frappe
 from frappe import _
 from frappe.query_builder.functions import Sum
+from agricultural_marketing.utils.taxes import get_tax_rate
 
 
 def execute(filters=None):
@@ -504,18 +505,6 @@ def get_income_section_data(gl_filters, filters, trial_balance_settings, child,
         result.append(section_data[section])
 
 
-def get_tax_rate():
-    default_tax_template = frappe.db.get_single_value("Agriculture Settings", "default_tax")
-
-    if not default_tax_template:
-        default_tax_template = frappe.db.get_value("Sales Taxes and Charges",
-                                                   {"is_default": 1}, "name")
-
-    tax_rate = frappe.db.get_value("Sales Taxes and Charges",
-                                   {"parent": default_tax_template}, "rate") or 0
-    return tax_rate
-
-
 def calculate_closing_balance(opening_debit, debit, opening_credit, credit):
     total_debit = opening_debit + debit
     total_credit = opening_credit + credit
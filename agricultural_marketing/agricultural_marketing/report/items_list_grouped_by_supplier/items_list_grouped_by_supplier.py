@@ -5,6 +5,7 @@ import frappe
 from frappe import _
 from frappe.query_builder.functions import Sum, Count, Avg
 from frappe.contacts.doctype.address.address import get_company_address
+from agricultural_marketing.utils.taxes import get_tax_rate
 
 
 def execute(filters=None):
@@ -119,16 +120,7 @@ def calculate_totals(data):
     })
     data.append(total_row)
     total_commission = sum([row['total_commission'] for row in data if row['total_commission']])
-    default_tax_template = frappe.db.get_single_value("Agriculture Settings", "default_tax")
-
-    if not default_tax_template:
-        default_tax_template = frappe.db.get_value("Sales Taxes and Charges",
-                                                   {"is_default": 1}, "name")
-
-    tax_rate = frappe.db.get_value("Sales Taxes and Charges",
-                                   {"parent": default_tax_template}, "rate") or 0
-
-    total_taxes = (total_commission * tax_rate) / 100
+    total_taxes = (total_commission * get_tax_rate()) / 100
     total_commission_row = {
         "total_qty": None,
         "price": None,
@@ -0,0 +1,26 @@
+"""
+Benchmarks of the app's hot paths, run against a site with `bench execute`, e.g.
+
+    bench --site mysite execute agricultural_marketing.benchmarks.running_balance.run \
+        --kwargs "{'company': 'My Company', 'party_type': 'Supplier', 'from_date': '2024-01-01'}"
+
+They only read from the site unless stated otherwise in their module.
+"""
+import time
+
+
+def measure(fn, repeat=5):
+    """Runs `fn` `repeat` times and returns the best wall time in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in [headers, *rows]:
+        print("  ".join(str(value).ljust(width) for value, width in zip(row, widths)))
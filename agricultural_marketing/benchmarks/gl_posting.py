@@ -0,0 +1,58 @@
+"""
+Submit latency of an Invoice Form against its item and customer count, and the posting of its GL rows through
+the GL Entry lifecycle (one document per row, the previous path) vs the batched insert.
+Every form is rolled back, nothing is left on the site.
+"""
+import time
+
+import frappe
+from frappe.utils import nowdate
+
+from agricultural_marketing.benchmarks import print_table
+from agricultural_marketing.utils.general_ledger import make_gl_entries_in_bulk
+
+
+def run(company, supplier, item_code, customers, sizes=(10, 50, 150, 500), repeat=3):
+    """`customers` is a list (or comma separated names) the form lines are spread over."""
+    if isinstance(customers, str):
+        customers = [customer.strip() for customer in customers.split(",")]
+
+    rows = []
+    for size in sizes:
+        items = [(customers[idx % len(customers)], 100) for idx in range(size)]
+        submit = min(time_step(company, supplier, item_code, items, lambda doc: doc.submit())
+                     for _ in range(repeat))
+        per_row = min(time_step(company, supplier, item_code, items, post_per_row) for _ in range(repeat))
+        bulk = min(time_step(company, supplier, item_code, items,
+                             lambda doc: make_gl_entries_in_bulk(doc.get_gl_map())) for _ in range(repeat))
+        rows.append((size, min(size, len(customers)), f"{submit * 1000:.1f}", f"{per_row * 1000:.1f}",
+                     f"{bulk * 1000:.1f}"))
+
+    print_table(("Items", "Customers", "Submit (ms)", "Per-row GL (ms)", "Bulk GL (ms)"), rows)
+
+
+def time_step(company, supplier, item_code, items, step):
+    """Inserts a draft form of `items`, times `step(doc)` on it and rolls everything back."""
+    doc = frappe.get_doc({
+        "doctype": "Invoice Form",
+        "company": company,
+        "supplier": supplier,
+        "posting_date": nowdate(),
+        "items": [{"item_code": item_code, "item_name": item_code, "qty": 1, "price": total, "total": total,
+                   "customer": customer} for customer, total in items]
+    })
+    doc.insert()
+    try:
+        start = time.perf_counter()
+        step(doc)
+        return time.perf_counter() - start
+    finally:
+        frappe.db.rollback()
+
+
+def post_per_row(doc):
+    for entry in doc.get_gl_map():
+        gle = frappe.new_doc("GL Entry")
+        gle.update(entry)
+        gle.flags.ignore_permissions = True
+        gle.submit()
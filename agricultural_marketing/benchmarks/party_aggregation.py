@@ -0,0 +1,64 @@
+"""
+The customer GL rows of an Invoice Form built by the previous list-scan builder vs PartyGLMap, at 100, 1,000
+and 5,000 lines. Pure Python, nothing is read from or written to the site.
+"""
+import frappe
+
+from agricultural_marketing.benchmarks import measure, print_table
+from agricultural_marketing.utils.general_ledger import PartyGLMap
+
+DEFAULTS = {
+    "posting_date": "2024-01-01",
+    "due_date": "2024-01-01",
+    "account_currency": "EGP",
+    "voucher_type": "Invoice Form",
+    "voucher_no": "ACC-INV-BENCHMARK",
+    "company": "Benchmark Company",
+    "cost_center": "Main - BC"
+}
+
+
+def run(sizes=(100, 1000, 5000), customers=None, repeat=5):
+    """`customers` is the number of distinct customers of the lines, one per 5 lines by default."""
+    rows = []
+    for size in sizes:
+        count = customers or max(1, size // 5)
+        lines = [frappe._dict(customer=f"Customer {idx % count}", total=100) for idx in range(size)]
+        old = measure(lambda: list_scan_builder(lines, "Debtors"), repeat)
+        new = measure(lambda: party_gl_map_builder(lines, "Debtors"), repeat)
+        rows.append((size, count, f"{old * 1000:.2f}", f"{new * 1000:.2f}", f"{old / new:.1f}x"))
+
+    print_table(("Lines", "Customers", "List scan (ms)", "PartyGLMap (ms)", "Speedup"), rows)
+
+
+def party_gl_map_builder(lines, receivable_account):
+    gl_map = PartyGLMap(DEFAULTS)
+    gl_map.add_lines(lines, receivable_account, "Customer", "customer")
+    return gl_map.get_gl_map()
+
+
+def list_scan_builder(lines, receivable_account):
+    """The builder PartyGLMap replaced: seen customers in a list, their GL row found by scanning the rows."""
+    gl_entries, customers = [], []
+    for it in lines:
+        if it.customer in customers:
+            customer_record = [d for d in gl_entries if d.get("party") == it.customer][0]
+            customer_record.update({
+                "debit": customer_record["debit"] + it.total,
+                "debit_in_account_currency": customer_record["debit_in_account_currency"] + it.total,
+                "debit_in_transaction_currency": customer_record["debit_in_transaction_currency"] + it.total,
+            })
+        else:
+            gl_entries.append({
+                **DEFAULTS,
+                "account": receivable_account,
+                "party_type": "Customer",
+                "party": it.customer,
+                "debit": it.total,
+                "debit_in_account_currency": it.total,
+                "debit_in_transaction_currency": it.total,
+                "transaction_exchange_rate": 1
+            })
+            customers.append(it.customer)
+
+    return gl_entries
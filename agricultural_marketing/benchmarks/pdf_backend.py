@@ -0,0 +1,51 @@
+"""
+Per-document latency of every HTML-to-PDF backend for the invoice_form, statement_forms and collection_form
+templates. The first conversion is reported apart, it includes loading the renderer (e.g. WeasyPrint fonts).
+"""
+import frappe
+from frappe.utils.jinja_globals import is_rtl
+
+from agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form import build_all_party_slips
+from agricultural_marketing.agricultural_marketing.page.collection_form.collection_form import get_report_html
+from agricultural_marketing.agricultural_marketing.page.statement_forms.statement_forms import render_documents
+from agricultural_marketing.benchmarks import measure, print_table
+from agricultural_marketing.pdf import get_letter_head
+from agricultural_marketing.utils.pdf_backend import PDF_BACKENDS, WEASYPRINT, import_weasyprint
+from agricultural_marketing.utils.print_templates import render_template
+
+
+def run(invoice_form, company, party_type, from_date, to_date=None, party_group=None, repeat=5):
+    filters = frappe._dict(company=company, party_type=party_type, from_date=from_date, to_date=to_date,
+                           party_group=party_group)
+    slip_filters, data = build_all_party_slips(invoice_form)[0]
+    documents = {
+        "invoice_form": render_template("doctype/invoice_form/invoice_form", {
+            "letter_head": get_letter_head(), "slips": [{"data": data, "filters": slip_filters}],
+            "lang": frappe.local.lang, "layout_direction": "rtl" if is_rtl() else "ltr"}),
+        "collection_form": get_report_html(filters)
+    }
+    statements = render_documents(filters)
+    if statements:
+        documents["statement_forms"] = statements[0][1]
+
+    rows = []
+    for backend, get_pdf in PDF_BACKENDS.items():
+        if backend == WEASYPRINT and not is_installed():
+            continue
+
+        for template, html in documents.items():
+            first = measure(lambda: get_pdf(html, {"orientation": "Portrait"}), 1)
+            best = measure(lambda: get_pdf(html, {"orientation": "Portrait"}), repeat)
+            rows.append((backend, template, f"{first * 1000:.1f}", f"{best * 1000:.1f}"))
+
+    print_table(("Backend", "Template", "First (ms)", "Best (ms)"), rows)
+
+
+def is_installed():
+    try:
+        import_weasyprint()
+    except frappe.ValidationError:
+        print("WeasyPrint is not installed, skipping it")
+        return False
+
+    return True
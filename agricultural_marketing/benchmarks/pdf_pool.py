@@ -0,0 +1,25 @@
+"""
+Parties per second of the Statement Forms PDF rendering at 1, 2, 4 and 8 worker processes. The statements are
+rendered to HTML once, only their conversion to PDF is timed, pool start-up included.
+"""
+import frappe
+
+from agricultural_marketing.agricultural_marketing.page.statement_forms.statement_forms import render_documents
+from agricultural_marketing.benchmarks import measure, print_table
+from agricultural_marketing.utils.pdf_pool import render_pdfs
+
+
+def run(company, party_type, from_date, to_date=None, party_group=None, workers=(1, 2, 4, 8), repeat=1):
+    filters = frappe._dict(company=company, party_type=party_type, from_date=from_date, to_date=to_date,
+                           party_group=party_group)
+    documents = render_documents(filters)
+    if not documents:
+        print("No data matches the chosen criteria")
+        return
+
+    rows = []
+    for count in workers:
+        seconds = measure(lambda: render_pdfs(documents, {"orientation": "Portrait"}, workers=count), repeat)
+        rows.append((count, len(documents), f"{seconds:.2f}", f"{len(documents) / seconds:.2f}"))
+
+    print_table(("Workers", "Parties", "Seconds", "Parties/s"), rows)
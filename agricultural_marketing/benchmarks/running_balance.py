@@ -0,0 +1,45 @@
+"""
+Python vs SQL running balance engine of the Statement Forms and Collection Form reports: time to load the rows
+of every party in scope and compute their period totals.
+"""
+import frappe
+
+from agricultural_marketing.agricultural_marketing.page.collection_form import collection_form
+from agricultural_marketing.agricultural_marketing.page.statement_forms import statement_forms
+from agricultural_marketing.benchmarks import measure, print_table
+from agricultural_marketing.utils.running_balance import get_ledger_totals
+from agricultural_marketing.utils.taxes import get_tax_rate
+
+
+def run(company, party_type, from_date, to_date=None, party_group=None, repeat=5):
+    filters = frappe._dict(company=company, party_type=party_type, from_date=from_date, to_date=to_date,
+                           party_group=party_group)
+    tax_rate = get_tax_rate()
+
+    def statement_python():
+        data = statement_forms.get_payments_details(statement_forms.get_items_details({}, filters), filters)
+        return [statement_forms.get_period_totals(party_data) for party_data in data.values()]
+
+    def statement_sql():
+        data = statement_forms.get_ledger_data({}, filters)
+        return [statement_forms.get_period_totals(party_data) for party_data in data.values()]
+
+    def collection_python():
+        data = {}
+        collection_form.process_result(collection_form.get_items_details(filters),
+                                       collection_form.get_payments_details(filters), data)
+        return [collection_form.get_period_totals(rows, filters, tax_rate) for rows in data.values()]
+
+    def collection_sql():
+        data = collection_form.get_ledger_data({}, filters)
+        return [get_ledger_totals(rows) for rows in data.values()]
+
+    parties = len(collection_form.get_ledger_data({}, filters))
+    rows = []
+    for report, python, sql in (("Statement Forms", statement_python, statement_sql),
+                                ("Collection Form", collection_python, collection_sql)):
+        python_time, sql_time = measure(python, repeat), measure(sql, repeat)
+        rows.append((report, parties, f"{python_time * 1000:.1f}", f"{sql_time * 1000:.1f}",
+                     f"{python_time / sql_time:.2f}x"))
+
+    print_table(("Report", "Parties", "Python (ms)", "SQL (ms)", "Speedup"), rows)
@@ -124,11 +124,57 @@ app_license = "mit"
 
 doc_events = {
     "Supplier": {
-        "after_insert": "agricultural_marketing.standard_doctypes.supplier.create_related_customer",
-        "on_trash": "agricultural_marketing.standard_doctypes.supplier.delete_related_customer",
-    }
+        "before_insert": "agricultural_marketing.standard_doctypes.supplier.create_related_customer",
+        "on_update": "agricultural_marketing.utils.commission.clear_party_commission_percentage",
+        "on_trash": [
+            "agricultural_marketing.standard_doctypes.supplier.delete_related_customer",
+            "agricultural_marketing.utils.commission.clear_party_commission_percentage",
+        ],
+    },
+    "Customer": {
+        "on_update": "agricultural_marketing.utils.commission.clear_party_commission_percentage",
+        "on_trash": "agricultural_marketing.utils.commission.clear_party_commission_percentage",
+    },
+    "Customer Group": {
+        "on_update": "agricultural_marketing.utils.commission.clear_commission_percentage_cache",
+        "on_trash": "agricultural_marketing.utils.commission.clear_commission_percentage_cache",
+    },
+    "Supplier Group": {
+        "on_update": "agricultural_marketing.utils.commission.clear_commission_percentage_cache",
+        "on_trash": "agricultural_marketing.utils.commission.clear_commission_percentage_cache",
+    },
+    "Agriculture Settings": {
+        "on_update": [
+            "agricultural_marketing.utils.commission.clear_commission_percentage_cache",
+            "agricultural_marketing.utils.taxes.clear_tax_cache",
+            "agricultural_marketing.utils.commission.clear_pos_profile_cache",
+        ],
+    },
+    "POS Profile": {
+        "on_update": "agricultural_marketing.utils.commission.clear_pos_profile_cache",
+        "on_trash": "agricultural_marketing.utils.commission.clear_pos_profile_cache",
+    },
+    "Mode of Payment": {
+        "on_update": "agricultural_marketing.utils.commission.clear_pos_profile_cache",
+        "on_trash": "agricultural_marketing.utils.commission.clear_pos_profile_cache",
+    },
+    "Sales Taxes and Charges Template": {
+        "on_update": "agricultural_marketing.utils.taxes.clear_tax_cache",
+        "on_trash": "agricultural_marketing.utils.taxes.clear_tax_cache",
+    },
 }
 
+# Cache
+# -----
+# Cached values to drop on `bench clear-cache`
+
+clear_cache = [
+    "agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings.clear_agriculture_settings_cache",
+    "agricultural_marketing.utils.commission.clear_commission_percentage_cache",
+    "agricultural_marketing.utils.taxes.clear_tax_cache",
+    "agricultural_marketing.utils.commission.clear_pos_profile_cache",
+]
+
 # Scheduled Tasks
 # ---------------
 
@@ -2,9 +2,11 @@ import json
 import os
 
 import frappe
-from frappe import _
 from frappe.utils.jinja_globals import is_rtl
-from frappe.utils.pdf import get_pdf as _get_pdf
+
+from agricultural_marketing.utils.pdf_backend import get_pdf as _get_pdf, get_pdf_backend
+from agricultural_marketing.utils.pdf_cache import get_cached_pdf, set_cached_pdf
+from agricultural_marketing.utils.print_templates import get_template_path, render_template
 
 
 @frappe.whitelist()
@@ -14,33 +16,64 @@ def get_pdf(filters, template, doctype, orientation="Portrait"):
     # FIXME: There is an issue in generated pdf filename
     # FIXME: Handle this method to be standalone can be used for any template not only invoice form
     if isinstance(filters, str):
-        filters_j = json.loads(filters)
+        filters = json.loads(filters)
 
-    filters = frappe._dict(filters_j)
+    filters = frappe._dict(filters)
+    frappe.has_permission(filters.get("reference_doctype"), "read", filters.get("reference_name"), throw=True)
 
-    template_filename = os.path.join(template + '.html')
-    folder = os.path.dirname(frappe.get_module("agricultural_marketing" + "." + "agricultural_marketing" +
-                                               "." + "doctype").__file__)
-    doctype_path = os.path.join(folder, doctype)
-    paths_temp = os.path.join(doctype_path, template_filename)
-    if not os.path.exists(doctype_path):
-        frappe.throw(_("No template found for this doctype"))
+    template_name = f"doctype/{doctype}/{template}"
+    template_path = get_template_path(template_name)
 
-    html_format = frappe.utils.get_html_format(paths_temp)
-    res = build_pdf_template_context(filters)
+    # Submitted / cancelled documents never change, so their rendered PDF can be reused
+    content, cache_key = None, None
+    reference = frappe.db.get_value(filters.get("reference_doctype"), filters.get("reference_name"),
+                                    ["docstatus", "modified"], as_dict=True)
+    if reference and reference.docstatus != 0:
+        cache_key = [filters.get("reference_name"), filters.get("party"), filters.get("party_type"),
+                     filters.get("customer_type"), template, orientation, frappe.local.lang,
+                     frappe.db.get_value("Letter Head", {"name": "Invoice Form", "disabled": 0}, "modified"),
+                     reference.modified, get_pdf_backend(), os.path.getmtime(template_path)]
+        content = get_cached_pdf(cache_key)
 
-    try:
-        letter_head = None
-        letter_head = frappe.get_doc("Letter Head", {"name": "Invoice Form", "disabled": 0}) or None
-    except frappe.DoesNotExistError:
-        pass
+    if content is None:
+        res = build_pdf_template_context(filters)
 
-    context = {"letter_head": letter_head, "data": res, "filters": filters, "lang": frappe.local.lang,
-               "layout_direction": "rtl" if (is_rtl()) else "ltr"}
-    html = frappe.render_template(html_format, context)
+        context = {"letter_head": get_letter_head(), "slips": [{"data": res, "filters": filters}],
+                   "lang": frappe.local.lang, "layout_direction": "rtl" if (is_rtl()) else "ltr"}
+        html = render_template(template_name, context)
+        content = _get_pdf(html, {"orientation": orientation, "title": f"{filters.get('reference_name')}.pdf"})
+        if cache_key:
+            set_cached_pdf(cache_key, content)
 
     frappe.local.response.filename = f"{filters.get('reference_name')}.pdf"
-    frappe.local.response.filecontent = _get_pdf(html, {"orientation": orientation,
-                                                        "title": f"{filters.get('reference_name')}.pdf"})
+    frappe.local.response.filecontent = content
     frappe.local.response.type = "pdf"
     frappe.local.lang = "ar"
+
+
+@frappe.whitelist()
+def get_all_parties_pdf(reference_name, orientation="Portrait"):
+    """
+    One PDF of the supplier slip followed by the slip of every customer and pamper of an Invoice Form.
+    The slips are rendered into one HTML, each on its own page, and converted in a single pass.
+    """
+    from agricultural_marketing.agricultural_marketing.doctype.invoice_form.invoice_form import (
+        build_all_party_slips)
+    frappe.has_permission("Invoice Form", "read", reference_name, throw=True)
+
+    slips = [{"data": data, "filters": filters} for filters, data in build_all_party_slips(reference_name)]
+    context = {"letter_head": get_letter_head(), "slips": slips, "lang": frappe.local.lang,
+               "layout_direction": "rtl" if (is_rtl()) else "ltr"}
+    html = render_template("doctype/invoice_form/invoice_form", context)
+    content = _get_pdf(html, {"orientation": orientation, "title": f"{reference_name}.pdf"})
+
+    frappe.local.response.filename = f"{reference_name}.pdf"
+    frappe.local.response.filecontent = content
+    frappe.local.response.type = "pdf"
+
+
+def get_letter_head():
+    try:
+        return frappe.get_doc("Letter Head", {"name": "Invoice Form", "disabled": 0}) or None
+    except frappe.DoesNotExistError:
+        return None
@@ -1,21 +1,44 @@
+import json
+
 import frappe
+from frappe import _
+from frappe.utils import cint
+
+BULK_CHUNK_SIZE = 100
 
 
 def create_related_customer(self, method):
+    """
+    Create the related customer before the supplier is inserted, so `related_customer` and
+    `related_customer_group` are written by the supplier insert itself.
+    """
+    if self.flags.skip_related_customer:
+        return
+
+    customer_group = (self.related_customer_group or self.flags.default_customer_group
+                      or get_default_customer_group())
+    related_customer = make_related_customer(self, customer_group)
+    self.related_customer = related_customer.name
+    self.related_customer_group = related_customer.customer_group
+
+
+def make_related_customer(supplier, customer_group):
     related_customer = frappe.new_doc("Customer")
     related_customer.update(
         {
-            "customer_name": self.supplier_name,
-            "customer_group": self.related_customer_group or frappe.db.get_single_value("Selling Settings",
-                                                                                        "customer_group"),
+            "customer_name": supplier.supplier_name,
+            "customer_group": customer_group,
             "is_farmer": 1,
-            "commission_percentage": self.commission_percentage
+            "commission_percentage": supplier.commission_percentage
         }
     )
 
     related_customer.insert(ignore_permissions=True)
-    self.db_set("related_customer", related_customer.name)
-    self.db_set("related_customer_group", related_customer.customer_group)
+    return related_customer
+
+
+def get_default_customer_group():
+    return frappe.db.get_single_value("Selling Settings", "customer_group")
 
 
 def delete_related_customer(self, method):
@@ -23,3 +46,102 @@ def delete_related_customer(self, method):
         customer = frappe.get_doc("Customer", self.related_customer)
         customer.run_method("on_trash")
         frappe.delete_doc("Customer", self.related_customer, for_reload=True)
+
+
+@frappe.whitelist()
+def bulk_onboard_suppliers(suppliers, create_related_customers=1):
+    """Create the `suppliers` (a list of Supplier field values) in a background job."""
+    if isinstance(suppliers, str):
+        suppliers = json.loads(suppliers)
+
+    frappe.has_permission("Supplier", "create", throw=True)
+    frappe.enqueue(
+        "agricultural_marketing.standard_doctypes.supplier.bulk_create_suppliers",
+        queue="long",
+        timeout=7200,
+        suppliers=suppliers,
+        create_related_customers=cint(create_related_customers)
+    )
+
+
+def bulk_create_suppliers(suppliers, create_related_customers=1):
+    """
+    Create the `suppliers` and their related customers, committing every `BULK_CHUNK_SIZE` suppliers.
+    The default customer group is resolved once for the batch, `create_related_customers=0` skips the
+    related customer (e.g. when it is backfilled later). Failures are published to the user over realtime.
+    """
+    customer_group = get_default_customer_group()
+    created, failures = 0, []
+
+    for idx, values in enumerate(suppliers, start=1):
+        frappe.db.savepoint("bulk_create_supplier")
+        try:
+            supplier = frappe.new_doc("Supplier")
+            supplier.update(values)
+            supplier.flags.skip_related_customer = not create_related_customers
+            supplier.flags.default_customer_group = customer_group
+            supplier.insert()
+            created += 1
+        except Exception as e:
+            frappe.db.rollback(save_point="bulk_create_supplier")
+            failures.append({"supplier_name": values.get("supplier_name"), "error": str(e)})
+
+        if idx % BULK_CHUNK_SIZE == 0 or idx == len(suppliers):
+            frappe.db.commit()
+            frappe.publish_progress(idx * 100 / len(suppliers), title=_("Creating Suppliers"),
+                                    description=_("{0} of {1}").format(idx, len(suppliers)))
+
+    frappe.publish_realtime("supplier_bulk_onboarding", {
+        "created": created,
+        "failures": failures
+    }, user=frappe.session.user)
+
+
+@frappe.whitelist()
+def backfill_related_customers():
+    """Create the missing related customers of existing suppliers in a background job."""
+    frappe.has_permission("Supplier", "write", throw=True)
+    frappe.has_permission("Customer", "create", throw=True)
+    frappe.enqueue(
+        "agricultural_marketing.standard_doctypes.supplier.create_missing_related_customers",
+        queue="long",
+        timeout=7200,
+        job_id="backfill_related_customers",
+        deduplicate=True
+    )
+
+
+def create_missing_related_customers():
+    """
+    Create a related customer for every supplier without one, committing every `BULK_CHUNK_SIZE` suppliers.
+    A supplier whose customer cannot be created is skipped, failures are published to the user over realtime.
+    """
+    default_customer_group = get_default_customer_group()
+    suppliers = frappe.get_all("Supplier", filters={"related_customer": ["is", "not set"]},
+                               fields=["name", "supplier_name", "commission_percentage", "related_customer_group"],
+                               order_by="creation")
+    created, failures = 0, []
+
+    for idx, supplier in enumerate(suppliers, start=1):
+        frappe.db.savepoint("backfill_related_customer")
+        try:
+            related_customer = make_related_customer(supplier,
+                                                     supplier.related_customer_group or default_customer_group)
+            frappe.db.set_value("Supplier", supplier.name, {
+                "related_customer": related_customer.name,
+                "related_customer_group": related_customer.customer_group
+            }, update_modified=False)
+            created += 1
+        except Exception as e:
+            frappe.db.rollback(save_point="backfill_related_customer")
+            failures.append({"supplier": supplier.name, "error": str(e)})
+
+        if idx % BULK_CHUNK_SIZE == 0 or idx == len(suppliers):
+            frappe.db.commit()
+            frappe.publish_progress(idx * 100 / len(suppliers), title=_("Creating Related Customers"),
+                                    description=_("{0} of {1}").format(idx, len(suppliers)))
+
+    frappe.publish_realtime("related_customers_backfill", {
+        "created": created,
+        "failures": failures
+    }, user=frappe.session.user)
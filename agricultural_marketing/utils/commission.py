@@ -0,0 +1,99 @@
+import frappe
+
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+
+PARTY_COMMISSION_CACHE_KEY = "agriculture_party_commission_percentage"
+GROUP_COMMISSION_CACHE_KEY = "agriculture_group_commission_percentage"
+POS_PROFILE_CACHE_KEY = "agriculture_commission_pos_profile"
+
+PARTY_GROUPS = {
+    "Customer": ("Customer Group", "customer_group"),
+    "Supplier": ("Supplier Group", "supplier_group"),
+}
+
+
+def get_party_commission_percentage(party_type, party):
+    """
+    Returns the commission percentage for the given `party`.
+    Will first search in party (Customer / Supplier) record, if not found,
+    will search in group (Customer Group / Supplier Group),
+    finally will return default.
+    The effective percentage is cached per party."""
+    return frappe.cache.hget(
+        PARTY_COMMISSION_CACHE_KEY, f"{party_type}::{party}",
+        generator=lambda: resolve_commission_percentages(party_type, [party]).get(party, 0)
+    )
+
+
+def get_parties_commission_percentage(party_type, parties):
+    """Resolve the commission percentage of many `parties` in one query and warm the per-party cache."""
+    percentages = resolve_commission_percentages(party_type, parties)
+    for party, percentage in percentages.items():
+        frappe.cache.hset(PARTY_COMMISSION_CACHE_KEY, f"{party_type}::{party}", percentage)
+
+    return percentages
+
+
+def resolve_commission_percentages(party_type, parties):
+    parties = list(set(parties))
+    if not parties:
+        return {}
+
+    group_doctype, group_field = PARTY_GROUPS[party_type]
+    group_percentages = get_group_commission_percentages(group_doctype)
+    default_percentage = get_agriculture_settings().get("customer_commission_percentage", 0)
+
+    percentages = {party: default_percentage for party in parties}
+    for row in frappe.get_all(party_type, filters={"name": ["in", parties]},
+                              fields=["name", "commission_percentage", group_field]):
+        percentages[row.name] = (row.commission_percentage or group_percentages.get(row.get(group_field))
+                                 or default_percentage)
+
+    return percentages
+
+
+def get_group_commission_percentages(group_doctype):
+    """Returns {group: commission percentage} for all the groups having a percentage set."""
+    def load_group_percentages():
+        if not frappe.get_meta(group_doctype).has_field("commission_percentage"):
+            return {}
+
+        return dict(frappe.get_all(group_doctype, filters={"commission_percentage": [">", 0]},
+                                   fields=["name", "commission_percentage"], as_list=True))
+
+    return frappe.cache.hget(GROUP_COMMISSION_CACHE_KEY, group_doctype, generator=load_group_percentages)
+
+
+def get_commission_pos_profile(company):
+    """
+    Returns the commission POS profile with its default mode of payment and that mode's
+    account for `company` (POS profile -> default MOP -> account), cached per company.
+    Shared by the commission GL entries and the commission invoice.
+    """
+    def load_pos_profile():
+        pos_profile = get_agriculture_settings().get("pos_profile")
+        default_mode_of_payment = frappe.db.get_value("POS Payment Method",
+                                                      {"parenttype": "POS Profile", "parent": pos_profile,
+                                                       "default": 1}, "mode_of_payment")
+        return frappe._dict(
+            name=pos_profile,
+            default_mode_of_payment=default_mode_of_payment,
+            default_account=frappe.db.get_value("Mode of Payment Account",
+                                                {"parent": default_mode_of_payment, "company": company},
+                                                "default_account") if default_mode_of_payment else None
+        )
+
+    return frappe.cache.hget(POS_PROFILE_CACHE_KEY, company, generator=load_pos_profile)
+
+
+def clear_pos_profile_cache(doc=None, method=None):
+    frappe.cache.delete_value(POS_PROFILE_CACHE_KEY)
+
+
+def clear_party_commission_percentage(doc, method=None):
+    frappe.cache.hdel(PARTY_COMMISSION_CACHE_KEY, f"{doc.doctype}::{doc.name}")
+
+
+def clear_commission_percentage_cache(doc=None, method=None):
+    frappe.cache.delete_value([PARTY_COMMISSION_CACHE_KEY, GROUP_COMMISSION_CACHE_KEY])
@@ -0,0 +1,333 @@
+import frappe
+from frappe import _
+from frappe.query_builder.functions import Sum
+from frappe.utils import flt, formatdate, getdate, now
+from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_checks_for_pl_and_bs_accounts
+from erpnext.accounts.general_ledger import validate_accounting_period
+from erpnext.accounts.utils import get_fiscal_year
+
+GL_ENTRY_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "posting_date", "due_date", "fiscal_year", "company", "account", "account_currency",
+    "party_type", "party", "cost_center", "voucher_type", "voucher_no", "remarks",
+    "debit", "credit", "debit_in_account_currency", "credit_in_account_currency",
+    "debit_in_transaction_currency", "credit_in_transaction_currency", "transaction_exchange_rate",
+    "is_opening", "is_advance", "is_cancelled", "to_rename"
+)
+
+AMOUNT_FIELDS = (
+    "debit", "credit", "debit_in_account_currency", "credit_in_account_currency",
+    "debit_in_transaction_currency", "credit_in_transaction_currency"
+)
+
+REVERSED_FIELDS = (
+    "posting_date", "due_date", "fiscal_year", "company", "account", "account_currency",
+    "party_type", "party", "cost_center", "voucher_type", "voucher_no", "against",
+    "against_voucher_type", "against_voucher", "transaction_exchange_rate", "is_opening", "is_advance"
+)
+
+
+def make_gl_entries_in_bulk(gl_map):
+    """
+    Post all the `gl_map` rows of one voucher with a single multi-row insert.
+    The voucher is validated once as a whole (balance, accounting period, accounts,
+    parties and cost centers) instead of running the GL Entry lifecycle per row.
+    """
+    gl_map = [frappe._dict(entry) for entry in gl_map]
+    if not gl_map:
+        return
+
+    validate_gl_map(gl_map)
+    validate_accounting_period(gl_map)
+
+    fiscal_year = get_fiscal_year(gl_map[0].posting_date, company=gl_map[0].company)[0]
+    to_rename = 0 if frappe.get_meta("GL Entry").autoname == "hash" else 1
+    timestamp, user = now(), frappe.session.user
+
+    values = []
+    for entry in gl_map:
+        entry.update({
+            "name": frappe.generate_hash(length=10),
+            "creation": timestamp,
+            "modified": timestamp,
+            "owner": user,
+            "modified_by": user,
+            "docstatus": 1,
+            "fiscal_year": fiscal_year,
+            "is_opening": entry.get("is_opening") or "No",
+            "is_advance": entry.get("is_advance") or "No",
+            "is_cancelled": entry.get("is_cancelled") or 0,
+            "to_rename": to_rename
+        })
+        for field in AMOUNT_FIELDS:
+            entry[field] = flt(entry.get(field))
+
+        values.append(tuple(entry.get(field) for field in GL_ENTRY_FIELDS))
+
+    frappe.db.bulk_insert("GL Entry", fields=GL_ENTRY_FIELDS, values=values)
+    validate_balance_types(gl_map)
+
+
+def reverse_gl_entries_in_bulk(voucher_type, voucher_no):
+    """
+    Cancel the GL entries of a voucher and post their mirror rows with a single insert.
+    Validation runs on a plain read before the rows are locked, so the locks are only
+    held for the select, the cancel update and the bulk insert.
+    """
+    voucher = frappe.db.get_value("GL Entry", {"voucher_type": voucher_type, "voucher_no": voucher_no,
+                                               "is_cancelled": 0},
+                                  ["voucher_type", "company", "posting_date"], as_dict=True)
+    if not voucher:
+        return
+
+    validate_accounting_period([voucher])
+
+    gl_entry = frappe.qb.DocType("GL Entry")
+    gl_entries = (
+        frappe.qb.from_(gl_entry)
+        .select(*REVERSED_FIELDS, *AMOUNT_FIELDS)
+        .where(gl_entry.voucher_type == voucher_type)
+        .where(gl_entry.voucher_no == voucher_no)
+        .where(gl_entry.is_cancelled == 0)
+        .for_update()
+    ).run()
+    if not gl_entries:
+        return
+
+    set_as_cancel(voucher_type, voucher_no)
+
+    to_rename = 0 if frappe.get_meta("GL Entry").autoname == "hash" else 1
+    timestamp, user = now(), frappe.session.user
+    remarks = "On cancellation of " + voucher_no
+    fields = ("name", "creation", "modified", "owner", "modified_by", "docstatus", "remarks",
+              "is_cancelled", "to_rename", *REVERSED_FIELDS,
+              "debit", "credit", "debit_in_account_currency", "credit_in_account_currency",
+              "debit_in_transaction_currency", "credit_in_transaction_currency")
+
+    # Mirror rows are built column-wise: the copied columns are kept and every debit/credit pair is swapped
+    split = len(REVERSED_FIELDS)
+    values = []
+    for row in gl_entries:
+        copied, (debit, credit, debit_in_ac, credit_in_ac, debit_in_tc, credit_in_tc) = row[:split], row[split:]
+        if not (debit or credit):
+            continue
+
+        values.append((frappe.generate_hash(length=10), timestamp, timestamp, user, user, 1, remarks, 1, to_rename,
+                       *copied, credit, debit, credit_in_ac, debit_in_ac, credit_in_tc, debit_in_tc))
+
+    if values:
+        frappe.db.bulk_insert("GL Entry", fields=fields, values=values)
+
+
+def delete_gl_entries_in_bulk(voucher_type, voucher_no):
+    """Purge the GL entries of a voucher and its payment ledger rows with one DELETE each."""
+    filters = {"voucher_type": voucher_type, "voucher_no": voucher_no}
+    frappe.db.delete("GL Entry", filters)
+    frappe.db.delete("Payment Ledger Entry", filters)
+
+
+def set_as_cancel(voucher_type, voucher_no):
+    """
+    Set is_cancelled=1 in all original gl entries for the voucher
+    """
+    frappe.db.sql(
+        """UPDATE `tabGL Entry` SET is_cancelled = 1,
+        modified=%s, modified_by=%s
+        where voucher_type=%s and voucher_no=%s and is_cancelled = 0""",
+        (now(), frappe.session.user, voucher_type, voucher_no),
+    )
+
+
+def validate_gl_map(gl_map):
+    """Validate the whole voucher at once, resolving every link with one query per doctype."""
+    for entry in gl_map:
+        for field in ("account", "voucher_type", "voucher_no", "posting_date", "company"):
+            if not entry.get(field):
+                frappe.throw(_("{0} is required in GL Entry").format(_(frappe.unscrub(field))))
+
+    accounts_settings = frappe.db.get_value("Accounts Settings", None,
+                                            ["acc_frozen_upto", "frozen_accounts_modifier"], as_dict=True)
+    validate_balance(gl_map)
+    validate_freezing_date(gl_map, accounts_settings)
+    accounts = get_accounts(gl_map)
+    validate_accounts(gl_map, accounts, accounts_settings)
+    validate_parties(gl_map, accounts_settings)
+    validate_cost_centers(gl_map)
+    validate_accounting_dimensions(gl_map, accounts)
+
+
+def validate_balance(gl_map):
+    precision = frappe.get_precision("GL Entry", "debit") or 2
+    total_debit = flt(sum(flt(entry.get("debit")) for entry in gl_map), precision)
+    total_credit = flt(sum(flt(entry.get("credit")) for entry in gl_map), precision)
+
+    if abs(total_debit - total_credit) > (0.5 / (10 ** precision)):
+        frappe.throw(_("Debit and Credit not equal for {0} #{1}. Difference is {2}.").format(
+            gl_map[0].voucher_type, gl_map[0].voucher_no, total_debit - total_credit))
+
+
+def validate_freezing_date(gl_map, accounts_settings):
+    """Entries dated on or before `Accounts Frozen Till` need the `Role Allowed to Set Frozen Accounts`."""
+    frozen_upto = accounts_settings.acc_frozen_upto
+    if not frozen_upto or not any(getdate(entry.posting_date) <= getdate(frozen_upto) for entry in gl_map):
+        return
+
+    if (accounts_settings.frozen_accounts_modifier not in frappe.get_roles()
+            or frappe.session.user == "Administrator"):
+        frappe.throw(_("You are not authorized to add or update entries before {0}").format(
+            formatdate(frozen_upto)))
+
+
+def validate_accounts(gl_map, accounts, accounts_settings):
+    can_edit_frozen = accounts_settings.frozen_accounts_modifier in frappe.get_roles()
+
+    for entry in gl_map:
+        account = accounts.get(entry.account)
+        if not account:
+            frappe.throw(_("Account {0} does not exist").format(entry.account))
+        if account.company != entry.company:
+            frappe.throw(_("Account {0} does not belong to Company {1}").format(entry.account, entry.company))
+        if account.is_group:
+            frappe.throw(_("Account {0} is a Group Account and cannot be used in transactions").format(
+                entry.account))
+        if account.disabled:
+            frappe.throw(_("Account {0} is disabled").format(entry.account))
+        if account.account_type in ("Receivable", "Payable") and not (entry.party_type and entry.party):
+            frappe.throw(_("Party Type and Party is required for Receivable / Payable account {0}").format(
+                entry.account))
+        if account.freeze_account == "Yes":
+            if not accounts_settings.frozen_accounts_modifier:
+                frappe.throw(_("Account {0} is frozen").format(entry.account))
+            if not can_edit_frozen:
+                frappe.throw(_("Not authorized to edit frozen Account {0}").format(entry.account))
+
+
+def get_accounts(gl_map):
+    """Returns {name: account} of the accounts of `gl_map`, read with one query."""
+    return {
+        account.name: account for account in frappe.get_all(
+            "Account", filters={"name": ["in", list({entry.account for entry in gl_map})]},
+            fields=["name", "company", "is_group", "disabled", "account_type", "freeze_account", "balance_must_be",
+                    "report_type"])
+    }
+
+
+def validate_parties(gl_map, accounts_settings):
+    parties_by_type = {}
+    for entry in gl_map:
+        if entry.get("party_type") and entry.get("party"):
+            parties_by_type.setdefault(entry.party_type, set()).add(entry.party)
+
+    for party_type, parties in parties_by_type.items():
+        # Only customers and suppliers can be disabled or frozen
+        fields = ["name", "disabled", "is_frozen"] if party_type in ("Customer", "Supplier") else ["name"]
+        existing = {
+            party.name: party for party in frappe.get_all(party_type, filters={"name": ["in", list(parties)]},
+                                                          fields=fields)
+        }
+        missing = parties - set(existing)
+        if missing:
+            frappe.throw(_("{0} {1} does not exist").format(_(party_type), ", ".join(sorted(missing))))
+
+        for party in existing.values():
+            if party.get("disabled"):
+                frappe.throw(_("{0} {1} is disabled").format(_(party_type), party.name))
+            if party.get("is_frozen") and accounts_settings.frozen_accounts_modifier not in frappe.get_roles():
+                frappe.throw(_("{0} {1} is frozen").format(_(party_type), party.name))
+
+
+def validate_cost_centers(gl_map):
+    cost_centers = {entry.cost_center for entry in gl_map if entry.get("cost_center")}
+    if not cost_centers:
+        return
+
+    existing = {
+        cc.name: cc for cc in frappe.get_all(
+            "Cost Center", filters={"name": ["in", list(cost_centers)]}, fields=["name", "is_group"])
+    }
+    for cost_center in cost_centers:
+        if cost_center not in existing:
+            frappe.throw(_("Cost Center {0} does not exist").format(cost_center))
+        if existing[cost_center].is_group:
+            frappe.throw(_("Cost Center {0} is a group cost center and cannot be used in transactions").format(
+                cost_center))
+
+
+def validate_accounting_dimensions(gl_map, accounts):
+    """The accounting dimensions mandatory for the Profit and Loss / Balance Sheet accounts of the company."""
+    dimensions = get_checks_for_pl_and_bs_accounts()
+    if not dimensions:
+        return
+
+    for entry in gl_map:
+        report_type = accounts[entry.account].report_type
+        for dimension in dimensions:
+            if dimension.company != entry.company or dimension.disabled or entry.get(dimension.fieldname):
+                continue
+            if report_type == "Profit and Loss" and dimension.mandatory_for_pl:
+                frappe.throw(_("Accounting Dimension {0} is required for 'Profit and Loss' account {1}.").format(
+                    frappe.bold(dimension.label), frappe.bold(entry.account)))
+            if report_type == "Balance Sheet" and dimension.mandatory_for_bs:
+                frappe.throw(_("Accounting Dimension {0} is required for 'Balance Sheet' account {1}.").format(
+                    frappe.bold(dimension.label), frappe.bold(entry.account)))
+
+
+def validate_balance_types(gl_map):
+    """
+    Accounts whose `Balance must be` Debit / Credit may not end up with the opposite balance, checked once the
+    rows are inserted with one grouped query.
+    """
+    accounts = [account for account in get_accounts(gl_map).values() if account.balance_must_be]
+    if not accounts:
+        return
+
+    gl_entry = frappe.qb.DocType("GL Entry")
+    balances = dict(
+        frappe.qb.from_(gl_entry).select(gl_entry.account, Sum(gl_entry.debit) - Sum(gl_entry.credit))
+        .where(gl_entry.account.isin([account.name for account in accounts])).groupby(gl_entry.account).run()
+    )
+    for account in accounts:
+        balance = flt(balances.get(account.name))
+        if (account.balance_must_be == "Debit" and balance < 0) or (account.balance_must_be == "Credit"
+                                                                    and balance > 0):
+            frappe.throw(_("Balance for Account {0} must always be {1}").format(account.name,
+                                                                                _(account.balance_must_be)))
+
+
+class PartyGLMap:
+    """
+    Builds the GL rows of one voucher, merging repeated lines of the same
+    (account, party type, party, side) into one row through a dict index.
+    """
+
+    def __init__(self, defaults):
+        self.defaults = defaults
+        self.entries = {}
+
+    def add(self, account, amount, party_type=None, party=None, side="debit"):
+        key = (account, party_type, party, side)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {
+                **self.defaults,
+                "account": account,
+                "party_type": party_type,
+                "party": party,
+                side: 0,
+                f"{side}_in_account_currency": 0,
+                f"{side}_in_transaction_currency": 0,
+                "transaction_exchange_rate": 1
+            }
+
+        entry[side] += amount
+        entry[f"{side}_in_account_currency"] += amount
+        entry[f"{side}_in_transaction_currency"] += amount
+        return entry
+
+    def add_lines(self, lines, account, party_type, party_field, amount_field="total", side="debit"):
+        """Aggregate child table `lines` per `party_field` (e.g. customer or pamper)."""
+        for line in lines:
+            self.add(account, flt(line.get(amount_field)), party_type, line.get(party_field), side)
+
+    def get_gl_map(self):
+        return list(self.entries.values())
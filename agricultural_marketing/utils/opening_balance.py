@@ -0,0 +1,86 @@
+import frappe
+from frappe.query_builder.functions import Sum
+from frappe.utils import flt
+from pypika import Case
+
+
+def get_opening_balances(party_type, party_scope, from_date):
+    """
+    Returns {party: (debit, credit)} of the GL entries posted before `from_date` or marked as opening,
+    aggregated for all the parties of `party_scope` in a single grouped query.
+    """
+    gle = frappe.qb.DocType("GL Entry")
+    result = party_scope.apply(frappe.qb.from_(gle), gle.party).where(gle.party_type == party_type).where(
+        gle.is_cancelled == 0).where((gle.posting_date < from_date) | (gle.is_opening == "Yes")).groupby(
+        gle.party).select(gle.party, Sum(gle.debit).as_("debit"), Sum(gle.credit).as_("credit")).run(as_dict=True)
+
+    return {row.party: (flt(row.debit), flt(row.credit)) for row in result}
+
+
+def get_opening_balance(opening_balances, party):
+    """Returns the (debit, credit) opening of `party`, zero when it has no GL entries before the period."""
+    return opening_balances.get(party, (0, 0))
+
+
+def get_draft_totals(filters, party_scope):
+    """
+    Returns {party: _dict(items, payments, commission)} of the draft invoice forms and payment entries
+    posted before `from_date`, aggregated for all the parties of `party_scope` with one grouped query each.
+    """
+    draft_totals = {}
+
+    def set_totals(result, key):
+        for row in result:
+            draft_totals.setdefault(row.party, frappe._dict(items=0, payments=0, commission=0))[key] = flt(row.total)
+
+    set_totals(get_draft_items_totals(filters, party_scope), "items")
+    set_totals(get_draft_payments_totals(filters, party_scope), "payments")
+    if filters.get("party_type") == "Supplier":
+        set_totals(get_draft_commission_totals(filters, party_scope), "commission")
+
+    return draft_totals
+
+
+def get_draft_total(draft_totals, party):
+    return draft_totals.get(party) or frappe._dict(items=0, payments=0, commission=0)
+
+
+def get_draft_items_totals(filters, party_scope):
+    invform = frappe.qb.DocType("Invoice Form")
+    invformitem = frappe.qb.DocType("Invoice Form Item")
+    _field = invformitem.customer if filters.get("party_type") == "Customer" else invform.supplier
+
+    query = frappe.qb.from_(invform).left_join(invformitem).on(invformitem.parent == invform.name)
+    return party_scope.apply(query, _field).where(
+        invform.company == filters.get('company')).where(invform.docstatus == 0).where(
+        invform.posting_date.lt(filters.get("from_date"))).groupby(_field).select(
+        _field.as_("party"), Sum(invformitem.total).as_("total")).run(as_dict=True)
+
+
+def get_draft_commission_totals(filters, party_scope):
+    invform = frappe.qb.DocType("Invoice Form")
+
+    return party_scope.apply(frappe.qb.from_(invform), invform.supplier).where(
+        invform.company == filters.get('company')).where(invform.docstatus == 0).where(
+        invform.posting_date.lt(filters.get("from_date"))).groupby(invform.supplier).select(
+        invform.supplier.as_("party"), Sum(invform.total_commissions_and_taxes).as_("total")).run(as_dict=True)
+
+
+def get_draft_payments_totals(filters, party_scope):
+    entry = frappe.qb.DocType("Payment Entry")
+    paid_amount = get_signed_paid_amount(entry, filters.get("party_type"))
+
+    return party_scope.apply(frappe.qb.from_(entry), entry.party).where(
+        entry.company == filters.get('company')).where(entry.posting_date.lt(filters.get("from_date"))).where(
+        entry.docstatus == 0).groupby(entry.party).select(
+        entry.party.as_("party"), Sum(paid_amount).as_("total")).run(as_dict=True)
+
+
+def get_signed_paid_amount(entry, party_type):
+    """
+    The paid amount of a Payment Entry row signed by its payment type: payments to a supplier and receipts from a
+    customer are positive, the opposite type is negative.
+    """
+    positive, negative = ("Pay", "Receive") if party_type == "Supplier" else ("Receive", "Pay")
+    return Case().when(entry.payment_type == positive, entry.paid_amount).when(
+        entry.payment_type == negative, entry.paid_amount * -1).else_(entry.paid_amount)
@@ -0,0 +1,48 @@
+import frappe
+
+
+class PartyScope:
+    """
+    The parties a report runs for, either one explicit party or every party of `party_type` matching
+    `party_filters`. Queries are restricted to the scope with a semi-join against the party table,
+    so the party names never travel to the database as a list of literals.
+    """
+
+    def __init__(self, party_type, party=None, party_filters=None):
+        self.party_type = party_type
+        self.party = party
+        self.party_filters = party_filters or {}
+
+    def condition(self, field):
+        """Returns the criterion restricting `field` (a party column) to the scope."""
+        if self.party:
+            return field == self.party
+
+        return field.isin(self.get_parties_query())
+
+    def apply(self, query, field):
+        return query.where(self.condition(field))
+
+    def get_parties_query(self):
+        party = frappe.qb.DocType(self.party_type)
+        query = frappe.qb.from_(party).select(party.name)
+        for fieldname, value in self.party_filters.items():
+            query = query.where(party[fieldname] == value)
+
+        return query
+
+    def get_parties(self):
+        if self.party:
+            return [self.party]
+
+        return self.get_parties_query().run(pluck=True)
+
+
+def get_party_scope(filters):
+    """Returns the PartyScope of the report `filters` (party type, party and party group)."""
+    party_filters = {"is_customer": 1} if filters.get("party_type") == "Customer" else {}
+    if filters.get("party_group"):
+        party_group = "customer_group" if filters.get('party_type') == "Customer" else "supplier_group"
+        party_filters[party_group] = filters.get('party_group')
+
+    return PartyScope(filters.get("party_type"), filters.get("party"), party_filters)
@@ -0,0 +1,55 @@
+import frappe
+from frappe import _
+from frappe.utils import get_url
+from frappe.utils.pdf import get_pdf as get_wkhtmltopdf_pdf
+
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+
+WKHTMLTOPDF = "wkhtmltopdf"
+WEASYPRINT = "WeasyPrint"
+
+# WeasyPrint font configuration of this worker, loading the system fonts is the costly part of a render
+weasyprint_font_config = None
+
+
+def get_pdf(html, options=None):
+    """Convert `html` to PDF with the backend chosen in Agriculture Settings."""
+    return PDF_BACKENDS[get_pdf_backend()](html, options)
+
+
+def get_pdf_backend():
+    backend = get_agriculture_settings().get("pdf_backend")
+    return backend if backend in PDF_BACKENDS else WKHTMLTOPDF
+
+
+def get_weasyprint_pdf(html, options=None):
+    """Render `html` in this process, without starting a wkhtmltopdf process per document."""
+    global weasyprint_font_config
+    HTML, CSS, FontConfiguration = import_weasyprint()
+
+    if weasyprint_font_config is None:
+        weasyprint_font_config = FontConfiguration()
+
+    stylesheets = []
+    if (options or {}).get("orientation") == "Landscape":
+        stylesheets.append(CSS(string="@page { size: A4 landscape; }", font_config=weasyprint_font_config))
+
+    return HTML(string=html, base_url=get_url()).write_pdf(stylesheets=stylesheets,
+                                                           font_config=weasyprint_font_config)
+
+
+def import_weasyprint():
+    try:
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+    except ImportError:
+        frappe.throw(_("WeasyPrint is not installed, install it or set the PDF Backend to wkhtmltopdf"))
+
+    return HTML, CSS, FontConfiguration
+
+
+PDF_BACKENDS = {
+    WKHTMLTOPDF: get_wkhtmltopdf_pdf,
+    WEASYPRINT: get_weasyprint_pdf,
+}
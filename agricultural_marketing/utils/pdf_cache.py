@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+import frappe
+from frappe.utils import cint
+
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+
+PDF_CACHE_FOLDER = "agricultural_marketing_pdf_cache"
+DEFAULT_PDF_CACHE_SIZE = 200
+
+
+def get_cached_pdf(key):
+    """Returns the cached PDF content for `key` (a list of values identifying the rendered PDF) or None."""
+    if not get_cache_limit():
+        return None
+
+    path = get_cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+
+    # Touch the file, eviction drops the least recently used PDFs first
+    os.utime(path)
+    return content
+
+
+def set_cached_pdf(key, content):
+    limit = get_cache_limit()
+    if not limit:
+        return
+
+    path = get_cache_path(key)
+    temp_path = f"{path}.{frappe.generate_hash(length=8)}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    # Atomic, other workers never read a partially written PDF
+    os.replace(temp_path, path)
+
+    evict_pdf_cache(limit)
+
+
+def evict_pdf_cache(limit):
+    entries = []
+    for entry in os.scandir(get_cache_folder()):
+        if entry.name.endswith(".pdf"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(size for _mtime, size, _path in entries)
+    for _mtime, size, path in sorted(entries):
+        if total_size <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+def get_cache_limit():
+    """Returns the cache size limit in bytes, 0 means the cache is disabled."""
+    size = get_agriculture_settings().get("pdf_cache_size")
+    return (DEFAULT_PDF_CACHE_SIZE if size is None else cint(size)) * 1024 * 1024
+
+
+def get_cache_path(key):
+    digest = hashlib.sha256("\x1f".join(str(part) for part in key).encode()).hexdigest()
+    return os.path.join(get_cache_folder(), f"{digest}.pdf")
+
+
+def get_cache_folder():
+    folder = frappe.get_site_path("private", PDF_CACHE_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    return folder
@@ -0,0 +1,60 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import frappe
+from frappe.utils import cint
+
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+from agricultural_marketing.utils.pdf_backend import get_pdf
+
+# Every worker is a fresh interpreter with its own database connection, so the pool is kept small
+DEFAULT_PDF_WORKERS = 2
+
+
+def render_pdfs(documents, options=None, on_progress=None, workers=None):
+    """
+    Convert `documents` ([(name, html)]) to PDF, fanning them out to a pool of `workers` processes,
+    by default the `PDF Workers` setting. Returns [(name, content)] in the same order.
+    `on_progress(done, total)` is called in this process after each document.
+    Only meant for background jobs, every worker process connects to the site.
+    """
+    total = len(documents)
+    workers = min(workers or get_pdf_workers(), total)
+    if workers <= 1:
+        results = []
+        for idx, (name, html) in enumerate(documents, start=1):
+            results.append((name, get_pdf(html, options)))
+            if on_progress:
+                on_progress(idx, total)
+        return results
+
+    contents = {}
+    # Workers are spawned (not forked) so they never share this process' database connection
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker,
+                             initargs=(frappe.local.site, frappe.local.sites_path, frappe.session.user,
+                                       frappe.local.lang)) as executor:
+        futures = {executor.submit(render_pdf, html, options): idx for idx, (_name, html) in enumerate(documents)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            contents[futures[future]] = future.result()
+            if on_progress:
+                on_progress(done, total)
+
+    return [(name, contents[idx]) for idx, (name, _html) in enumerate(documents)]
+
+
+def get_pdf_workers():
+    """Returns the configured number of PDF workers, 0 means `DEFAULT_PDF_WORKERS`."""
+    return cint(get_agriculture_settings().get("pdf_workers")) or DEFAULT_PDF_WORKERS
+
+
+def init_worker(site, sites_path, user, lang):
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    frappe.set_user(user)
+    frappe.local.lang = lang
+
+
+def render_pdf(html, options):
+    return get_pdf(html, options)
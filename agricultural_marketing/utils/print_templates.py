@@ -0,0 +1,46 @@
+import os
+
+import frappe
+from frappe import _
+from frappe.utils import get_html_format
+
+# Compiled template code of this worker: {name: (mtime, code)}
+compiled_templates = {}
+
+
+def render_template(name, context):
+    """
+    Render the app template `name`, its path relative to the `agricultural_marketing` module
+    without the extension (e.g. "page/statement_forms/statement_forms").
+    Templates are read and compiled once per worker, and reloaded on change in developer mode.
+    """
+    return get_template(name).render(context)
+
+
+def get_template(name):
+    """
+    Only the compiled code is cached, the template is bound to the jinja environment of the current request
+    on every call, so it renders with this request's globals (session, form_dict) instead of the first one's.
+    """
+    jenv = frappe.get_jenv()
+    return jenv.template_class.from_code(jenv, get_template_code(jenv, name), jenv.make_globals(None), None)
+
+
+def get_template_code(jenv, name):
+    path = get_template_path(name)
+    cached = compiled_templates.get(name)
+    if cached and not (frappe.conf.developer_mode and cached[0] != os.path.getmtime(path)):
+        return cached[1]
+
+    code = jenv.compile(get_html_format(path))
+    compiled_templates[name] = (os.path.getmtime(path), code)
+    return code
+
+
+def get_template_path(name):
+    folder = frappe.get_app_path("agricultural_marketing", "agricultural_marketing")
+    path = os.path.realpath(os.path.join(folder, name + ".html"))
+    if not path.startswith(os.path.realpath(folder) + os.sep) or not os.path.exists(path):
+        frappe.throw(_("No template found for {0}").format(name))
+
+    return path
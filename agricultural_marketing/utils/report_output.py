@@ -0,0 +1,55 @@
+import io
+import random
+import zipfile
+
+import frappe
+from pypdf import PdfReader, PdfWriter
+
+OUTPUT_SEPARATE_FILES = "Separate Files"
+OUTPUT_MERGED_PDF = "Merged PDF"
+OUTPUT_ZIP_ARCHIVE = "ZIP Archive"
+
+
+def save_report_output(documents, output, file_name):
+    """
+    Save the rendered `documents` ([(party, pdf content)]) and return their file urls.
+    Separate Files keeps a public File per party, Merged PDF and ZIP Archive save a single private File.
+    """
+    if output == OUTPUT_MERGED_PDF:
+        return [save_file(f"{file_name}.pdf", merge_pdfs(documents), is_private=1)]
+    if output == OUTPUT_ZIP_ARCHIVE:
+        return [save_file(f"{file_name}.zip", zip_pdfs(documents), is_private=1)]
+
+    return [save_file(f"{party}.pdf", content) for party, content in documents]
+
+
+def merge_pdfs(documents):
+    """Returns one PDF of all `documents`, with a bookmark to the first page of each party."""
+    writer = PdfWriter()
+    for party, content in documents:
+        writer.append(PdfReader(io.BytesIO(content)), outline_item=party)
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def zip_pdfs(documents):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for party, content in documents:
+            archive.writestr("{0}.pdf".format(party.replace("/", "-")), content)
+
+    return output.getvalue()
+
+
+def save_file(file_name, content, is_private=0):
+    name, extension = file_name.rsplit(".", 1)
+    file_doc = frappe.new_doc("File")
+    file_doc.update({
+        "file_name": "{0}-{1}.{2}".format(name, str(random.randint(1000, 9999)), extension),
+        "is_private": is_private,
+        "content": content
+    })
+    file_doc.save(ignore_permissions=True)
+    return file_doc.file_url
@@ -0,0 +1,127 @@
+import frappe
+from frappe import _
+from frappe.query_builder.functions import Sum
+from frappe.utils import flt
+from pypika import analytics as an
+from pypika.terms import Term
+
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+from agricultural_marketing.utils.opening_balance import get_signed_paid_amount
+from agricultural_marketing.utils.taxes import get_tax_rate
+
+ENGINE_PYTHON = "Python"
+ENGINE_SQL = "SQL"
+PERIOD_TOTALS = ("sales", "commission", "payments")
+
+
+def use_sql_engine():
+    """True when the reports render from the SQL ledger, in compare mode they keep rendering from the Python path."""
+    settings = get_agriculture_settings()
+    return (settings.get("running_balance_engine") == ENGINE_SQL
+            and not settings.get("compare_running_balance_engines"))
+
+
+def compare_engines():
+    settings = get_agriculture_settings()
+    return (settings.get("running_balance_engine") == ENGINE_SQL
+            and bool(settings.get("compare_running_balance_engines")))
+
+
+def get_ledger(filters, party_scope):
+    """
+    Returns {party: rows} of the invoice lines and payments of the report period, ready to render. The lines and
+    payments are unioned in SQL, ordered by posting date and reference, and every row carries the running sales,
+    commission (with taxes) and payments of its party, computed with window functions. The window is ordered by
+    (date, reference_id) with the default RANGE framing, so the lines of one invoice share their running value and
+    only the last row of a party is read, as its period totals. Amounts are in the supplier orientation. With
+    `neglect_items` the lines are merged into one row per invoice.
+    """
+    ledger = get_invoice_lines_query(filters, party_scope).union_all(
+        get_payments_query(filters, party_scope)).as_("ledger")
+    commission = ledger.commission * (1 + flt(get_tax_rate()) / 100)
+
+    def running(field):
+        return an.Sum(field).over(ledger.party).orderby(ledger.date, ledger.reference_id)
+
+    result = frappe.qb.from_(ledger).select(
+        ledger.star,
+        running(ledger.total).as_("running_sales"),
+        running(commission).as_("running_commission"),
+        running(ledger.paid_amount).as_("running_payments")
+    ).orderby(ledger.party).orderby(ledger.date).orderby(ledger.reference_id).orderby(
+        ledger.item_name).run(as_dict=True)
+
+    rows_by_party = {}
+    for row in result:
+        rows_by_party.setdefault(row.pop("party"), []).append(row)
+
+    return rows_by_party
+
+
+def get_ledger_totals(rows):
+    """Returns the sales, commission (with taxes) and payments totals of a party, read from its last ledger row."""
+    last_row = rows[-1] if rows else {}
+    return frappe._dict({
+        "sales": flt(last_row.get("running_sales")),
+        "commission": flt(last_row.get("running_commission")),
+        "payments": flt(last_row.get("running_payments"))
+    })
+
+
+def compare_period_totals(party, python_totals, ledger_totals):
+    """Logs `party` to the Error Log when the Python and SQL engines disagree on its period totals."""
+    if any(flt(python_totals[key], 2) != flt(ledger_totals[key], 2) for key in PERIOD_TOTALS):
+        frappe.log_error(title=_("Running balance engines differ for {0}").format(party),
+                         message=frappe.as_json({"python": python_totals, "sql": ledger_totals}))
+
+
+def get_invoice_lines_query(filters, party_scope):
+    invform = frappe.qb.DocType("Invoice Form")
+    invformitem = frappe.qb.DocType("Invoice Form Item")
+    _field = invformitem.customer if filters.get("party_type") == "Customer" else invform.supplier
+    query = frappe.qb.from_(invform).left_join(invformitem).on(invformitem.parent == invform.name).select(
+        Term.wrap_constant("Invoice Form").as_("doctype"), _field.as_("party"), invform.name.as_("reference_id"),
+        invform.posting_date.as_("date"))
+
+    commission = invformitem.commission if filters.get("party_type") == "Supplier" else Term.wrap_constant(0)
+    if filters.get("neglect_items"):
+        query = query.select(
+            Term.wrap_constant(None).as_("item_name"), Term.wrap_constant(None).as_("qty"),
+            Term.wrap_constant(None).as_("price"), Sum(invformitem.total).as_("total"),
+            Sum(commission).as_("commission")).groupby(_field).groupby(invform.name).groupby(invform.posting_date)
+    else:
+        query = query.select(invformitem.item_name, invformitem.qty, invformitem.price, invformitem.total,
+                             commission.as_("commission"))
+
+    query = query.select(
+        Term.wrap_constant(None).as_("mop"), Term.wrap_constant(None).as_("payment_type"),
+        Term.wrap_constant(None).as_("remarks"), Term.wrap_constant(0).as_("paid_amount"))
+
+    return apply_period_filters(filters, party_scope.apply(query, _field), invform)
+
+
+def get_payments_query(filters, party_scope):
+    entry = frappe.qb.DocType("Payment Entry")
+    paid_amount = get_signed_paid_amount(entry, filters.get("party_type"))
+    query = frappe.qb.from_(entry).select(
+        Term.wrap_constant("Payment Entry").as_("doctype"), entry.party.as_("party"),
+        entry.name.as_("reference_id"), entry.posting_date.as_("date"), Term.wrap_constant(None).as_("item_name"),
+        Term.wrap_constant(None).as_("qty"), Term.wrap_constant(None).as_("price"),
+        Term.wrap_constant(0).as_("total"), Term.wrap_constant(0).as_("commission"),
+        entry.mode_of_payment.as_("mop"), entry.payment_type, entry.remarks, paid_amount.as_("paid_amount"))
+
+    return apply_period_filters(filters, party_scope.apply(query, entry.party), entry)
+
+
+def apply_period_filters(filters, query, doctype):
+    """The company, period and docstatus filters of the report item and payment queries."""
+    query = query.where(doctype.company == filters.get("company"))
+    if filters.get("from_date"):
+        query = query.where(doctype.posting_date.gte(filters.get("from_date")))
+    if filters.get("to_date"):
+        query = query.where(doctype.posting_date.lte(filters.get("to_date")))
+
+    if filters.get("consider_draft"):
+        return query.where(doctype.docstatus.isin([0, 1]))
+    return query.where(doctype.docstatus == 1)
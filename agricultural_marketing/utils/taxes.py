@@ -0,0 +1,33 @@
+import frappe
+from frappe.utils import flt
+
+from agricultural_marketing.agricultural_marketing.doctype.agriculture_settings.agriculture_settings import (
+    get_agriculture_settings)
+
+TAX_CACHE_KEY = "agriculture_default_tax"
+
+
+def get_tax_template():
+    """Returns the default tax template, from Agriculture Settings or the default Sales Taxes and Charges Template."""
+    return get_default_tax().get("template")
+
+
+def get_tax_rate():
+    """Returns the rate of the default tax template, cached in redis and memoized for the request."""
+    return get_default_tax().get("rate")
+
+
+def get_default_tax():
+    def load_default_tax():
+        template = get_agriculture_settings().get("default_tax")
+        if not template:
+            template = frappe.db.get_value("Sales Taxes and Charges Template", {"is_default": 1}, "name")
+
+        rate = frappe.db.get_value("Sales Taxes and Charges", {"parent": template}, "rate") if template else 0
+        return {"template": template, "rate": flt(rate)}
+
+    return frappe.cache.get_value(TAX_CACHE_KEY, generator=load_default_tax)
+
+
+def clear_tax_cache(doc=None, method=None):
+    frappe.cache.delete_value(TAX_CACHE_KEY)
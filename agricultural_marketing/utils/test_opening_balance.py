@@ -0,0 +1,155 @@
+# Copyright (c) 2024, Muhammad Salama and Contributors
+# See license.txt
+
+import frappe
+from frappe import scrub
+from frappe.query_builder.functions import Sum
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+from pypika import Case
+
+from agricultural_marketing.utils.opening_balance import get_draft_total, get_draft_totals
+from agricultural_marketing.utils.party_scope import get_party_scope
+
+DRAFT_TEST_COMPANY = "_Test Draft Totals Company"
+DRAFT_TEST_PARTY_GROUP = "_Test Draft Totals Group"
+
+
+class TestOpeningBalance(FrappeTestCase):
+	def test_grouped_draft_totals_match_per_party_totals(self):
+		for supplier in ("Supplier A", "Supplier B", "Supplier C"):
+			make_draft_party("Supplier", supplier)
+		for customer in ("Customer A", "Customer B"):
+			make_draft_party("Customer", customer)
+
+		make_draft_invoice_form("Supplier A", [("Customer A", 100), ("Customer B", 40)], commission=7)
+		make_draft_invoice_form("Supplier A", [("Customer A", 60)], commission=3)
+		make_draft_invoice_form("Supplier B", [("Customer B", 25)], commission=2)
+		# Submitted and in period forms are not part of the draft opening
+		make_draft_invoice_form("Supplier A", [("Customer A", 1000)], commission=50, docstatus=1)
+		make_draft_invoice_form("Supplier A", [("Customer A", 1000)], commission=50, posting_date="2024-02-01")
+		make_draft_payment_entry("Supplier", "Supplier A", "Pay", 30)
+		make_draft_payment_entry("Supplier", "Supplier B", "Pay", 5)
+		make_draft_payment_entry("Customer", "Customer A", "Receive", 80)
+		make_draft_payment_entry("Customer", "Customer A", "Pay", 20)
+
+		expected = {
+			"Supplier": {
+				"Supplier A": {"items": 200, "payments": 30, "commission": 10},
+				"Supplier B": {"items": 25, "payments": 5, "commission": 2},
+				"Supplier C": {"items": 0, "payments": 0, "commission": 0},
+			},
+			"Customer": {
+				"Customer A": {"items": 160, "payments": 60, "commission": 0},
+				"Customer B": {"items": 65, "payments": 0, "commission": 0},
+			},
+		}
+		# Draft payments are signed per row by their payment type, the per-party query they replace signed the
+		# whole sum by one of the types, so it only agrees for parties whose draft payments share one type
+		mixed_payment_types = {party_name("Customer A")}
+
+		for party_type, parties in expected.items():
+			filters = {
+				"company": DRAFT_TEST_COMPANY,
+				"party_type": party_type,
+				"party_group": DRAFT_TEST_PARTY_GROUP,
+				"from_date": "2024-01-15",
+			}
+			draft_totals = get_draft_totals(filters, get_party_scope(filters))
+			for party, totals in parties.items():
+				party = party_name(party)
+				draft_total = get_draft_total(draft_totals, party)
+				self.assertEqual(dict(draft_total), totals)
+
+				self.assertEqual(draft_total.items, get_party_draft_items(filters, party))
+				if party_type == "Supplier":
+					self.assertEqual(draft_total.commission, get_party_draft_commission(filters, party))
+				if party not in mixed_payment_types:
+					self.assertEqual(draft_total.payments, get_party_draft_payments(filters, party))
+
+
+def get_party_draft_items(filters, party):
+	"""The per-party draft items query the grouped `get_draft_totals` replaced."""
+	invform = frappe.qb.DocType("Invoice Form")
+	invformitem = frappe.qb.DocType("Invoice Form Item")
+	_field = invformitem.customer if filters.get("party_type") == "Customer" else invform.supplier
+	result = frappe.qb.from_(invform).left_join(invformitem).on(invformitem.parent == invform.name).where(
+		invform.company == filters.get("company")).where(_field == party).where(invform.docstatus == 0).where(
+		invform.posting_date.lt(filters.get("from_date"))).select(Sum(invformitem.total).as_("total")).run(as_dict=True)
+
+	return flt(sum(row.total for row in result if row.total))
+
+
+def get_party_draft_commission(filters, party):
+	"""The per-party draft commission query the grouped `get_draft_totals` replaced."""
+	invform = frappe.qb.DocType("Invoice Form")
+	result = frappe.qb.from_(invform).where(invform.company == filters.get("company")).where(
+		invform.supplier == party).where(invform.docstatus == 0).where(
+		invform.posting_date.lt(filters.get("from_date"))).select(
+		Sum(invform.total_commissions_and_taxes).as_("commission")).run(as_dict=True)
+
+	return flt(sum(row.commission for row in result if row.commission))
+
+
+def get_party_draft_payments(filters, party):
+	"""The per-party draft payments query the grouped `get_draft_totals` replaced, the sum is signed as a whole."""
+	entry = frappe.qb.DocType("Payment Entry")
+	positive, negative = ("Pay", "Receive") if filters.get("party_type") == "Supplier" else ("Receive", "Pay")
+	paid_amount = Case().when(entry.payment_type == positive, Sum(entry.paid_amount)).when(
+		entry.payment_type == negative, Sum(entry.paid_amount * -1)).else_(Sum(entry.paid_amount))
+	result = frappe.qb.from_(entry).where(entry.company == filters.get("company")).where(
+		entry.party == party).where(entry.posting_date.lt(filters.get("from_date"))).where(
+		entry.docstatus == 0).select(entry.payment_type, paid_amount.as_("paid_amount")).run(as_dict=True)
+
+	return flt(sum(row.paid_amount for row in result if row.paid_amount))
+
+
+def party_name(party):
+	return f"_Test Draft {party}"
+
+
+def make_draft_party(party_type, party):
+	doc = frappe.get_doc(
+		{"doctype": party_type, "name": party_name(party), scrub(party_type) + "_name": party_name(party)}
+	)
+	if party_type == "Customer":
+		doc.update({"customer_group": DRAFT_TEST_PARTY_GROUP, "is_customer": 1})
+	else:
+		doc.supplier_group = DRAFT_TEST_PARTY_GROUP
+	doc.db_insert()
+
+
+def make_draft_invoice_form(supplier, items, commission=0, posting_date="2024-01-01", docstatus=0):
+	doc = frappe.get_doc(
+		{
+			"doctype": "Invoice Form",
+			"name": frappe.generate_hash(length=10),
+			"company": DRAFT_TEST_COMPANY,
+			"supplier": party_name(supplier),
+			"posting_date": posting_date,
+			"docstatus": docstatus,
+			"total_commissions_and_taxes": commission,
+			"items": [
+				{"customer": party_name(customer), "total": total, "docstatus": docstatus}
+				for customer, total in items
+			],
+		}
+	)
+	doc.db_insert()
+	for row in doc.items:
+		row.db_insert()
+
+
+def make_draft_payment_entry(party_type, party, payment_type, paid_amount):
+	frappe.get_doc(
+		{
+			"doctype": "Payment Entry",
+			"name": frappe.generate_hash(length=10),
+			"company": DRAFT_TEST_COMPANY,
+			"party_type": party_type,
+			"party": party_name(party),
+			"payment_type": payment_type,
+			"paid_amount": paid_amount,
+			"posting_date": "2024-01-01",
+		}
+	).db_insert()